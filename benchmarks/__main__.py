@@ -0,0 +1,58 @@
+"""Run parser/formatter benchmarks
+
+> python -m benchmarks --json results.json
+> python -m benchmarks --baseline results.json --scale 0.1 -k tcpdump
+"""
+import sys
+import click
+from icecream import ic
+from . import fixtures, harness
+
+
+@click.command(help='Benchmark parsers and formatters on synthetic fixtures')
+@click.option('-k', 'names', multiple=True, help='Only run benchmarks whose name contains this (repeatable)')
+@click.option('--repeat', '-r', default=5, type=int, show_default=True)
+@click.option('--scale', default=1.0, type=float, show_default=True, help='Fixture size factor')
+@click.option('--json', 'json_path', help='Save results to this file (e.g. to be used as baseline later)')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare against results saved with --json')
+@click.option('--threshold', default=0.1, type=float, show_default=True, help='Relative median change reported as regression/speedup')
+@click.option('--fail-on-regression', is_flag=True)
+@click.option('--list', 'list_only', is_flag=True)
+def main(names, repeat, scale, json_path, baseline, threshold, fail_on_regression, list_only):
+    from . import bench_parsers, bench_common  # noqa: F401 (register benchmarks)
+    if list_only:
+        for name in harness.BENCHMARKS:
+            click.echo(name)
+        return
+    ic.disable()
+    fixtures.SCALE = scale
+
+    def _progress(r):
+        click.echo(f"{r['name']:<45} median {r['median'] * 1000:>10.2f}ms  min {r['min'] * 1000:>10.2f}ms  stdev {r['stdev'] * 1000:>8.2f}ms", err=True)
+
+    def _skipped(name, e):
+        click.secho(f"{name:<45} skipped ({e})", fg='yellow', err=True)
+
+    results = harness.run(names, repeat=repeat, progress=_progress, skipped=_skipped)
+    if json_path:
+        harness.save(json_path, results, harness.metadata(scale=scale, repeat=repeat))
+        click.echo(f"Results saved to {json_path}", err=True)
+    if not baseline:
+        return
+    base = harness.load(baseline)
+    if base['meta'].get('scale') != scale:
+        click.secho(f"Warning: baseline was run with scale={base['meta'].get('scale')}", fg='yellow', err=True)
+    regressions = 0
+    click.echo(f"\n{'Benchmark':<45} {'Baseline(ms)':>12} {'Current(ms)':>12} {'Ratio':>7}")
+    for name, b, c, ratio, verdict in harness.compare(results, base, threshold):
+        color = {'REGRESSION': 'red', 'faster': 'green'}.get(verdict)
+        b_text = '-' if b is None else f'{b * 1000:.2f}'
+        r_text = '-' if ratio is None else f'{ratio:.2f}x'
+        click.echo(f"{name:<45} {b_text:>12} {c * 1000:>12.2f} {r_text:>7} " + click.style(verdict, fg=color))
+        regressions += verdict == 'REGRESSION'
+    if regressions and fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
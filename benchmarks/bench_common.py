@@ -0,0 +1,65 @@
+from .harness import benchmark
+from . import fixtures
+
+MAPPINGS = {
+    'ID': 'id',
+    'Name': 'name',
+    'Owner': 'meta.owner.name',
+    'Tag': 'meta.owner.tags.1',
+    'Size': ('meta.size', lambda v: f'{v / 1024:.1f}K'),
+}
+
+
+def _common(name):
+    import corgi_common
+    return getattr(corgi_common, name)
+
+
+@benchmark('common.get[100k x 3 paths]', setup=lambda: (_common('get'), fixtures.nested_records()))
+def bench_get(get, records):
+    for r in records:
+        get(r, 'meta.owner.name')
+        get(r, 'meta.owner.tags.1')
+        get(r, 'meta.missing.key')
+
+
+def _flatten():
+    from corgi_common.dsutils import flatten
+    return flatten
+
+
+@benchmark('common.flatten[200k leaves]', setup=lambda: (_flatten(), fixtures.nested_lists()))
+def bench_flatten(flatten, lists):
+    flatten(lists)
+
+
+@benchmark('common.pretty_print[10k records]', setup=lambda: (_common('pretty_print'), fixtures.nested_records()[:fixtures.scaled(10_000)]))
+def bench_pretty_print(pretty_print, records):
+    pretty_print(records, mappings=MAPPINGS)
+
+
+def _stream_print():
+    from corgi_common.tableutils import stream_print
+    return stream_print
+
+
+@benchmark('common.stream_print[100k records]', setup=lambda: (_stream_print(), fixtures.nested_records()))
+def bench_stream_print(stream_print, records):
+    stream_print(records, mappings=MAPPINGS)
+
+
+def _caller_lookups(module, name):
+    import importlib
+    return getattr(importlib.import_module(module), name), fixtures.scaled(100_000)
+
+
+@benchmark('common.get_local_file_path[100k calls]', setup=lambda: _caller_lookups('corgi_common.pathutils', 'get_local_file_path'))
+def bench_get_local_file_path(get_local_file_path, n):
+    for _ in range(n):
+        get_local_file_path('policies.js')
+
+
+@benchmark('common.debug[100k disabled calls]', setup=lambda: _caller_lookups('corgi_common.loggingutils', 'debug'))
+def bench_debug(debug, n):
+    for _ in range(n):
+        debug('not logged')
@@ -0,0 +1,62 @@
+import random
+from .harness import benchmark
+from . import fixtures
+
+
+def _jvm(name):
+    import corgi_jvm.main
+    return getattr(corgi_jvm.main, name)
+
+
+@benchmark('jvm._print_stack_info[100k lines]', setup=lambda: (_jvm('_print_stack_info'), fixtures.thread_dump()))
+def bench_print_stack_info(print_stack_info, dump):
+    print_stack_info(dump, t_infos={})
+
+
+@benchmark('jvm._parse_native_mem[2k categories]', setup=lambda: (_jvm('_parse_native_mem'), fixtures.nmt_summary()))
+def bench_parse_native_mem(parse_native_mem, txt):
+    parse_native_mem(txt)
+
+
+@benchmark('jvm._guess_by[100k mappings]', setup=lambda: (_jvm('_guess_by'), fixtures.pmap_anon_kbytes()))
+def bench_guess_by(guess_by, kbytes):
+    for div in range(1, 5):
+        guess_by(kbytes, div)
+
+
+def _to_bytes_inputs():
+    rnd = random.Random(8)
+    return [rnd.choice(['512K', '64m', '2G', '1024B', '300MB', '12kb']) for _ in range(fixtures.scaled(100_000))]
+
+
+@benchmark('jvm._to_bytes[100k]', setup=lambda: (_jvm('_to_bytes'), _to_bytes_inputs()))
+def bench_to_bytes(to_bytes, texts):
+    for text in texts:
+        to_bytes(text)
+
+
+def _tcpdump(name):
+    import corgi_tcpdump.main
+    return getattr(corgi_tcpdump.main, name)
+
+
+@benchmark('tcpdump._parse_convs[1M rows]', setup=lambda: (_tcpdump('_parse_convs'), fixtures.tshark_conversations()))
+def bench_parse_convs(parse_convs, stdout):
+    parse_convs(stdout)
+
+
+@benchmark('tcpdump._decode_hex[1MB]', setup=lambda: (_tcpdump('_decode_hex'), random.Random(9).randbytes(fixtures.scaled(1 << 20)).hex()))
+def bench_decode_hex(decode_hex, h):
+    decode_hex(h)
+
+
+def _visible0():
+    from corgi_pg.pg_common import _visible0
+    return _visible0
+
+
+@benchmark('pg._visible0[1M tuples]', setup=lambda: (_visible0(), fixtures.heap_tuples()))
+def bench_visible0(visible0, records):
+    xip = [850, 900, 950]
+    for record in records:
+        visible0(record, 901, 800, 1000, xip)
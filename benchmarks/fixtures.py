@@ -0,0 +1,128 @@
+"""Synthetic inputs shaped like the real tool outputs, sized by a global scale factor"""
+import random
+from functools import lru_cache
+
+SCALE = 1.0
+
+
+def scaled(n):
+    return max(1, int(n * SCALE))
+
+
+@lru_cache(maxsize=None)
+def thread_dump(lines=100_000):
+    """jstack output, ~10 lines per thread"""
+    rnd = random.Random(1)
+    out = ['2024-01-01 00:00:00', 'Full thread dump OpenJDK 64-Bit Server VM (17.0.2+8 mixed mode, sharing):', '']
+    tid = 0
+    while len(out) < scaled(lines):
+        tid += 1
+        state = rnd.choice(['RUNNABLE', 'WAITING (parking)', 'TIMED_WAITING (sleeping)', 'BLOCKED (on object monitor)'])
+        daemon = ' daemon' if rnd.random() < 0.7 else ''
+        out.append(
+            f'"worker-{tid}" #{tid}{daemon} prio=5 os_prio=0 cpu={rnd.random() * 1000:.2f}ms '
+            f'elapsed={rnd.random() * 10000:.2f}s allocated={rnd.randint(1, 10**6)}K defined_classes={rnd.randint(0, 500)} '
+            f'tid=0x00007f{tid:010x} nid=0x{10000 + tid:x} {"runnable" if state == "RUNNABLE" else "waiting on condition"}  [0x00007f{tid:010x}]')
+        out.append(f'   java.lang.Thread.State: {state}')
+        for depth in range(rnd.randint(4, 12)):
+            out.append(f'\tat com.example.service.Module{depth}.method{rnd.randint(0, 50)}(Module{depth}.java:{rnd.randint(1, 900)})')
+        out.append('')
+    return '\n'.join(out)
+
+
+@lru_cache(maxsize=None)
+def tshark_conversations(rows=1_000_000):
+    """`tshark -q -z conv,tcp` table"""
+    rnd = random.Random(2)
+    out = [
+        '================================================================================',
+        'TCP Conversations',
+        'Filter:<No Filter>',
+        '                                               |       <-      | |       ->      | |     Total     |    Relative    |   Duration   |',
+        '                                               | Frames  Bytes | | Frames  Bytes | | Frames  Bytes |      Start     |              |',
+    ]
+    for i in range(scaled(rows)):
+        a = f'10.{i % 250}.{(i // 250) % 250}.{rnd.randint(1, 254)}:{rnd.randint(1024, 65535)}'
+        b = f'192.168.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}:443'
+        f1, f2 = rnd.randint(1, 5000), rnd.randint(1, 5000)
+        b1, b2 = rnd.randint(1, 1023), rnd.randint(1, 1023)
+        u1, u2 = rnd.choice(['bytes', 'kB', 'MB']), rnd.choice(['bytes', 'kB', 'MB'])
+        out.append(
+            f'{a:<26} <-> {b:<21} {f1:>7} {b1:>5} {u1:<5} {f2:>7} {b2:>5} {u2:<5} '
+            f'{f1 + f2:>7} {b1 + b2:>5} {u1:<5} {rnd.random() * 3600:>14.9f} {rnd.random() * 60:>12.4f}')
+    out.append('================================================================================')
+    return '\n'.join(out)
+
+
+@lru_cache(maxsize=None)
+def nmt_summary(categories=2_000):
+    """`jcmd VM.native_memory summary` output with many (synthetic) categories"""
+    rnd = random.Random(3)
+    names = ['Java Heap', 'Class', 'Thread', 'Code', 'GC', 'Compiler', 'Internal', 'Other', 'Symbol',
+             'Native Memory Tracking', 'Arena Chunk', 'Metaspace', 'String Deduplication']
+    out = ['Native Memory Tracking:', '', 'Total: reserved=7340032KB, committed=1146880KB', '']
+    for i in range(scaled(categories)):
+        name = names[i] if i < len(names) else f'Module{i}'
+        r = rnd.randint(1, 10**6)
+        out.append(f'-{name:>26} (reserved={r}KB, committed={rnd.randint(1, r)}KB)')
+        out.append(f'{"":28}(malloc={rnd.randint(1, 1000)}KB #{rnd.randint(1, 10**5)})')
+        out.append('')
+    return '\n'.join(out)
+
+
+@lru_cache(maxsize=None)
+def pmap_anon_kbytes(mappings=100_000):
+    """Kbytes column of `pmap -x <pid> | grep anon`, with glibc arena chunk pairs mixed in"""
+    rnd = random.Random(4)
+    out = []
+    while len(out) < scaled(mappings):
+        if rnd.random() < 0.3:
+            used = rnd.choice([132, 1024, 4096, 8192, 30000])
+            out += [used, 65536 - used]
+        else:
+            out.append(rnd.choice([4, 8, 12, 132, 1028, 2048, 10240]))
+    return out[:scaled(mappings)]
+
+
+@lru_cache(maxsize=None)
+def heap_tuples(count=1_000_000):
+    """pageinspect style tuple headers for visibility checks"""
+    rnd = random.Random(5)
+    records = []
+    for _ in range(scaled(count)):
+        xmin = rnd.randint(700, 1000)
+        xmax = rnd.choice([0, 0, rnd.randint(700, 1100)])
+        records.append({
+            'xmin': xmin,
+            'xmax': xmax,
+            'xmin_committed': rnd.random() < 0.8,
+            'xmin_aborted': rnd.random() < 0.05,
+            'xmax_committed': rnd.random() < 0.5,
+            'xmax_aborted': rnd.random() < 0.1,
+        })
+    return records
+
+
+@lru_cache(maxsize=None)
+def nested_records(count=100_000):
+    rnd = random.Random(6)
+    return [
+        {
+            'id': i,
+            'name': f'item-{i}',
+            'meta': {'owner': {'name': f'user{rnd.randint(0, 99)}', 'tags': ['a', 'b', 'c']}, 'size': rnd.randint(0, 10**6)},
+        }
+        for i in range(scaled(count))
+    ]
+
+
+@lru_cache(maxsize=None)
+def nested_lists(leaves=200_000):
+    rnd = random.Random(7)
+
+    def _build(n, depth):
+        if n <= 4 or depth > 12:
+            return list(range(n))
+        k = rnd.randint(2, 4)
+        return [_build(n // k, depth + 1) for _ in range(k)] + [n]
+    return _build(scaled(leaves), 0)
@@ -0,0 +1,98 @@
+import gc
+import io
+import sys
+import json
+import time
+import platform
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+
+BENCHMARKS = {}
+
+
+def benchmark(name, setup=None):
+    """Register `func(*setup())` as benchmark `name`, setup time is not measured"""
+    def decorator(func):
+        BENCHMARKS[name] = (func, setup)
+        return func
+    return decorator
+
+
+def _run_one(func, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        sink = io.StringIO()
+        with redirect_stdout(sink):   # parsers print their tables, don't let the terminal dominate
+            start = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(names=None, repeat=5, progress=None, skipped=None):
+    """Run registered benchmarks, those whose setup fails to import are reported to `skipped`"""
+    results = []
+    for name, (func, setup) in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        try:
+            args = setup() if setup else ()
+        except ImportError as e:
+            if skipped:
+                skipped(name, e)
+            continue
+        timings = _run_one(func, args, repeat)
+        result = {
+            'name': name,
+            'repeat': repeat,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        }
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
+
+
+def metadata(**extra):
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        **extra,
+    }
+
+
+def save(path, results, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compare medians with a saved baseline: [(name, baseline, current, ratio, verdict)]"""
+    base = {r['name']: r for r in baseline['results']}
+    rows = []
+    for r in results:
+        if r['name'] not in base:
+            rows.append((r['name'], None, r['median'], None, 'new'))
+            continue
+        b = base[r['name']]['median']
+        ratio = r['median'] / b if b else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'REGRESSION'
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        rows.append((r['name'], b, r['median'], ratio, verdict))
+    return rows
@@ -4,5 +4,6 @@
 # Description:
 
 rm -rf ./dist
+python -m corgi_common.jinja2utils corgi_aws/templates corgi_build/templates corgi_configure/templates
 # python setup.py sdist bdist_wheel --universal
 python setup.py sdist bdist_wheel
@@ -29,11 +29,12 @@ from .common import (
     latest_linux2_ami,
     ami_name,
     cf_template,
+    lazy_client,
 )
 from sys import platform
 
-ec2_client = boto3.client('ec2')
-cf_client = boto3.client('cloudformation')
+ec2_client = lazy_client('ec2')
+cf_client = lazy_client('cloudformation')
 
 logger = logging.getLogger(__name__)
 
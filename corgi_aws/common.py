@@ -2,12 +2,33 @@ import boto3
 import logging
 from troposphere import Template
 from collections.abc import Iterable
-
-ssm = boto3.client('ssm')
+from corgi_common import cached
 
 logger = logging.getLogger(__name__)
 
 
+class _LazyClient:
+    """boto3 client proxy, the real client is only created on first use"""
+
+    def __init__(self, service_name, **kwargs):
+        self._service_name = service_name
+        self._kwargs = kwargs
+        self._client = None
+
+    def __getattr__(self, name):
+        if self._client is None:
+            logger.info(f"Creating boto3 client: {self._service_name}")
+            self._client = boto3.client(self._service_name, **self._kwargs)
+        return getattr(self._client, name)
+
+
+def lazy_client(service_name, **kwargs):
+    return _LazyClient(service_name, **kwargs)
+
+
+ssm = lazy_client('ssm')
+
+
 def check_aws_credential():
     session = boto3.Session()
     creds = session.get_credentials().get_frozen_credentials()
@@ -57,6 +78,11 @@ def subnet_id(vpc_id=None, index=0):
     )['Subnets'][index]['SubnetId']
 
 
+def _region_key(*args, **kwargs):
+    return boto3.Session().region_name
+
+
+@cached(ttl=24 * 3600, persist=True, key=_region_key)
 def latest_linux2_ami():
     response = boto3.client('ec2').describe_images(
             Filters=[
@@ -124,6 +150,7 @@ def decide_username(imageName):
 
 class Regions:
     @classmethod
+    @cached(ttl=7 * 24 * 3600, persist=True, key=lambda cls: cls.__name__)
     def get_regions(cls):
         short_codes = cls._get_region_short_codes()
 
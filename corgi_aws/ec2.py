@@ -2,10 +2,10 @@ import click
 import logging
 import boto3
 from tabulate import tabulate
-from .common import Regions
+from .common import Regions, lazy_client
 from corgi_common import pretty_print, utc_to_local
 
-ec2_client = boto3.client('ec2')
+ec2_client = lazy_client('ec2')
 client = ec2_client
 logger = logging.getLogger(__name__)
 
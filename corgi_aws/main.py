@@ -1,14 +1,8 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 import click
-from corgi_common import config_logging, pretty_print, bye
-from .ec2 import ec2
-from .iam import iam
-from .cf import cf
-from .s3 import s3
-from .sqs import sqs
-from .route53 import route53
-from .lambda_ import lambda_
+from corgi_common import config_logging, pretty_print, bye, cached
+from corgi_common.clickutils import LazyGroup
 from corgi_common.pathutils import get_local_file_path
 from .common import check_aws_credential
 from requests import get
@@ -17,20 +11,34 @@ import json
 # Or can just click in the GUI: https://awspolicygen.s3.amazonaws.com/policygen.html
 AWS_POLICIES_FILE_URL = 'https://awspolicygen.s3.amazonaws.com/js/policies.js'
 
+def __parse_policies(t):
+    return json.loads(t.split('=')[1])
+
+@cached(ttl=24 * 3600, persist=True)
+def __download_policies():
+    r = get(AWS_POLICIES_FILE_URL)
+    if not r.ok:
+        raise Exception(f"Failed to download policies ({r.status_code})")
+    return __parse_policies(r.text)
+
 def __get_policies():
+    # the local copy is a fallback only, it is not cached so that the next run downloads again
     try:
-        r = get(AWS_POLICIES_FILE_URL)
-        if not r.ok:
-            raise Exception("Try local file instead")
-        t = r.text
+        return __download_policies()
     except Exception:
         with open(get_local_file_path('policies.js'), 'r') as f:
-            t = f.read()
-    t = t.split('=')[1]
-    return json.loads(t)
+            return __parse_policies(f.read())
 
 
-@click.group(help="CLI tool for AWS management", context_settings=dict(help_option_names=['-h', '--help']))
+@click.group(cls=LazyGroup, lazy_subcommands={
+    'ec2': 'corgi_aws.ec2.ec2',
+    'cf': 'corgi_aws.cf.cf',
+    'route53': 'corgi_aws.route53.route53',
+    'iam': 'corgi_aws.iam.iam',
+    's3': 'corgi_aws.s3.s3',
+    'sqs': 'corgi_aws.sqs.sqs',
+    'lambda': 'corgi_aws.lambda_.lambda_',
+}, help="CLI tool for AWS management", context_settings=dict(help_option_names=['-h', '--help']))
 def cli():
     check_aws_credential()
     pass
@@ -64,14 +72,6 @@ def list_actions(service_name):
         click.echo(f"{prefix}:{action}")
 
 
-cli.add_command(ec2)
-cli.add_command(cf)
-cli.add_command(route53)
-cli.add_command(iam)
-cli.add_command(s3)
-cli.add_command(sqs)
-cli.add_command(lambda_, "lambda")
-
 def main():
     config_logging('corgi_aws')
     cli()
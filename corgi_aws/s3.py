@@ -4,13 +4,14 @@ import json
 import logging
 import boto3
 from corgi_common.loggingutils import fatal, info
-from hprint import hprint as pretty_print
 import tempfile
 from tqdm import tqdm
 import botocore
+from .common import lazy_client
+from corgi_common.tableutils import stream_print
 
 
-client = boto3.client('s3')
+client = lazy_client('s3')
 
 logger = logging.getLogger(__name__)
 
@@ -81,7 +82,8 @@ def download(bucket_name, key, localfile):
 @s3.command(help='ls bucket')
 @click.argument("bucket-name", required=False)
 @click.option("--region-name", '-r')
-def ls(bucket_name, region_name):
+@click.option('--json', 'json_format', is_flag=True, help='Print as NDJSON')
+def ls(bucket_name, region_name, json_format):
     if region_name:
         s3 = boto3.client("s3", region_name=ic(region_name))
     else:
@@ -94,18 +96,18 @@ def ls(bucket_name, region_name):
             bucket_name = tokens[0]
 
         bucket_name = bucket_name.rstrip('/')
-        response = s3.list_objects_v2(
+        pages = s3.get_paginator('list_objects_v2').paginate(
             Bucket=ic(bucket_name),
             Prefix=ic(prefix),
             # Delimiter='/',
-            MaxKeys=1000
+            PaginationConfig={'PageSize': 1000},
         )
-        contents = response.get('Contents', [])
-        pretty_print(contents, mappings={
+        contents = (obj for page in pages for obj in page.get('Contents', []))
+        stream_print(contents, mappings={
             'Key': 'Key',
             'Size': 'Size',
             'LastModified': 'LastModified'
-        })
+        }, fmt='ndjson' if json_format else 'table')
     else:
         for bucket in boto3.resource('s3').buckets.all():
             print(bucket.name + '/')
@@ -1,10 +1,10 @@
 import click
 import logging
-import boto3
 import uuid
 import json
+from .common import lazy_client
 
-client = boto3.client('sqs')
+client = lazy_client('sqs')
 logger = logging.getLogger(__name__)
 
 
@@ -2,12 +2,13 @@
 # -*- coding: utf-8 -*-
 import click
 import base64
-from functools import lru_cache
 from corgi_common import config_logging, pretty_print, cached
 from corgi_common.loggingutils import debug, info
 from corgi_common.dateutils import time_str
+from corgi_common.tableutils import stream_print
+from corgi_common.restutils import new_session
+from corgi_common.concurrency import bounded_map
 import logging
-import requests
 import ciscoisesdk
 from ciscoisesdk import IdentityServicesEngineAPI
 from ciscoisesdk.exceptions import ApiError
@@ -27,6 +28,9 @@ def _color(v, func):
     else:
         return str(v)
 
+def _ise_key(ctx, resource_id, api=None):
+    return f"{ctx.obj['hostname']}:{ctx.obj['port']}/{resource_id}"
+
 @cached
 def _ise_restful_session(ctx):
     username = ctx.obj['username']
@@ -34,8 +38,7 @@ def _ise_restful_session(ctx):
     hostname = ctx.obj['hostname']
     port = ctx.obj['port']
 
-    s = requests.Session()
-    s.verify = False
+    s = new_session(verify=False)
     url_versioninfo = f'https://{hostname}:{port}/ers/config/sgt/versioninfo'
 
     r = s.get(ic(url_versioninfo), auth=(ic(username), ic(password)), headers={
@@ -46,10 +49,10 @@ def _ise_restful_session(ctx):
     assert r.ok, r.text
     csrf = r.headers.get('X-CSRF-Token')
     if csrf:                    # csrf enabled
-        s.headers = {
+        s.headers.update({
             'X-CSRF-Token': csrf,
             'ACCEPT': 'application/json',
-        }
+        })
         pass
     return s
 
@@ -124,8 +127,7 @@ def _ise_gui_session(ctx):
     username = ctx.obj['username']
     password = ctx.obj['password']
 
-    s = requests.Session()
-    s.verify = False
+    s = new_session(verify=False)
 
     login_jsp_url = _gui_url(ctx, '/admin/login.jsp')
     debug(f"GET {login_jsp_url}")
@@ -196,13 +198,13 @@ def radius_live_logs(ctx):
     pretty_print(response, mappings=mappings, as_json=ctx.obj['as_json'], x=ctx.obj['x'])
     pass
 
-def _resources(gen) -> list:
-    resources = []
+def _iter_resources(gen):
     for page_resp in gen:
         page_result = page_resp.response.SearchResult
-        for resource in page_result.resources:
-            resources.append(resource)
-    return resources
+        yield from page_result.resources
+
+def _resources(gen) -> list:
+    return list(_iter_resources(gen))
 
 def _resource(rest_response: ciscoisesdk.restresponse.RestResponse):
     response = rest_response.response
@@ -269,14 +271,14 @@ def network_devices(ctx):
         'radius_secret': 'radius_secret'
     }, as_json=ctx.obj['as_json'], x=ctx.obj['x'])
 
-@lru_cache
+@cached(ttl=3600, persist=True, key=_ise_key)
 def _group_name(ctx, group_id, api=None):
     api = api or _ise_api(ctx)
     group = _resource(api.identity_groups.get_by_id(group_id))
     # print(group)
     return group['name']
 
-@lru_cache
+@cached(ttl=3600, persist=True, key=_ise_key)
 def _profile_name(ctx, profile_id, api=None):
     api = api or _ise_api(ctx)
     profile = _resource(api.profiler_profile.get_by_id(profile_id))
@@ -319,24 +321,25 @@ def identity_group_create(ctx, name, desc):
 def endpoints(ctx):
     api = ctx.obj['api']
     endpoints_generator = api.endpoint.get_endpoints_generator()
-    data = []
-    for endpoint in _resources(endpoints_generator):
-        e_id = endpoint['id']
-        e = api.endpoint.get_by_id(e_id).response['ERSEndPoint']
+
+    def _endpoint(endpoint):
+        return api.endpoint.get_by_id(endpoint['id']).response['ERSEndPoint']
         # e_mac = e['mac']
         # e_profile_id = e['profileId']
         # e_group_id = e['groupId']
-        data.append(e)
-        # data.append(dict(
-        # ))
-    pretty_print(data, mappings={
+
+    def _endpoints():           # details fetched concurrently, still printed in listing order
+        return bounded_map(_endpoint, _iter_resources(endpoints_generator))
+
+    fmt = 'ndjson' if ctx.obj['as_json'] else 'x' if ctx.obj['x'] else 'table'
+    stream_print(_endpoints(), mappings={
         'id': 'id',
         'mac': 'mac',
         'group': ('groupId', lambda gid: _group_name(ctx, gid, api)),
         'group assignment': ('staticGroupAssignment', lambda b: 'y' if b else ''),
         'profile': ('profileId', lambda pid: _profile_name(ctx, pid, api)),
         'profile assignment': ('staticProfileAssignment', lambda b: 'y' if b else ''),
-    }, as_json=ctx.obj['as_json'], x=ctx.obj['x'])
+    }, fmt=fmt)
     pass
 
 @ise.command(help='User identity groups')
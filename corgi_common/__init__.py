@@ -1,26 +1,39 @@
 import tempfile
 import os
+import re
+import shutil
 import logging
-from functools import partial, wraps
-from logging.handlers import RotatingFileHandler
-from hprint import pretty_print
+from functools import partial, lru_cache
 import subprocess
+import shlex
 import sys
+import time
 import signal
 import getpass
 from contextlib import contextmanager
 # from threading import Thread
 from queue import Queue, Empty
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import traceback
 from icecream import ic, install as install_ic
 from datetime import datetime, timezone
 from click import echo
+from .streamutils import StreamMultiplexer
+from .asynclogging import BatchRotatingFileHandler, start_async_logging
+from .cacheutils import memoize
+from .dsutils import compile_path
+from .profileutils import STARTUP_PROFILE_OPTION, report_import_time, start_profiling_from_argv
 
 logger = logging.getLogger(__name__)
 debug = logging.getLogger().getEffectiveLevel() == logging.DEBUG
 
-nbsr_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='nbsr')
+
+def pretty_print(*args, **kwargs):
+    # hprint (and tabulate behind it) is slow to import: commands import this at top level,
+    # hprint is only loaded by the first call
+    from hprint import pretty_print as _pretty_print
+    return _pretty_print(*args, **kwargs)
+
 
 tabulate_print = pretty_print   # legecy code
 
@@ -51,7 +64,8 @@ class NonBlockingStreamReader:
                     logger.info("Stream EOF")
                     return
                     # raise UnexpectedEndOfStream
-        nbsr_executor.submit(_populateQueue, self._s, self._q)
+        from .concurrency import get_executor
+        get_executor('nbsr', max_workers=4).submit(_populateQueue, self._s, self._q)
         # self._t = Thread(target=_populateQueue, args=(self._s, self._q))
         # self._t.name = 'nbsr-thread'
         # self._t.daemon = True
@@ -80,7 +94,16 @@ def install_print_with_flush():
     setattr(builtins, 'print0', print)
     setattr(builtins, 'print', partial(print, flush=True))
 
-def config_logging(name, level=None):
+def config_logging(name, level=None, async_logging=None):
+    """async_logging: write log file on a background thread (default: env CORGI_ASYNC_LOGGING)
+
+    CORGI_TIMING=table|json|prometheus enables the timing registry (dumped at exit and on SIGUSR1)
+    --profile[=cprofile|sampling] profiles the command, hotspots are printed at exit
+    """
+    if STARTUP_PROFILE_OPTION in sys.argv:
+        sys.argv.remove(STARTUP_PROFILE_OPTION)
+        report_import_time()
+    start_profiling_from_argv(name)
     install_print_with_flush()
     ic.configureOutput(prefix=ic_time_format, includeContext=True)
     ic.disable()
@@ -97,17 +120,29 @@ def config_logging(name, level=None):
                 ic.enable()
                 sys.argv.remove(option)
                 break
+    if async_logging is None:
+        async_logging = os.getenv('CORGI_ASYNC_LOGGING', '').lower() in ('1', 'true', 'yes')
+    log_format = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(threadName)s - %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p')
+    file_handler = BatchRotatingFileHandler(
+        filename=os.path.join(tempfile.gettempdir(), name) + ".log",
+        maxBytes=10 * 1024 * 1024,  # 10M
+        backupCount=5)
+    file_handler.setFormatter(log_format)
     logging.basicConfig(
         handlers=[
-            RotatingFileHandler(
-                filename=os.path.join(tempfile.gettempdir(), name) + ".log",
-                maxBytes=10 * 1024 * 1024,  # 10M
-                backupCount=5),
+            start_async_logging(file_handler) if async_logging else file_handler,
             # logging.StreamHandler(),  # default to stderr
         ],
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(threadName)s - %(message)s',
-        datefmt='%m/%d/%Y %I:%M:%S %p')
+        level=level)
+    timing_format = os.getenv('CORGI_TIMING')
+    if timing_format:
+        from .timeutils import registry as timing_registry
+        try:
+            timing_registry.enable(timing_format)
+        except ValueError as e:
+            logger.warning(f"Ignoring CORGI_TIMING: {e}")
     if level == logging.DEBUG:
         import http.client as http_client
         http_client.HTTPConnection.debuglevel = 1
@@ -123,20 +158,11 @@ def config_logging(name, level=None):
 def _chain_get(data, chain, default=None):
     if not chain:
         return data
-    attrs = chain.split('.')
-    if len(attrs) == 1:
-        return data.get(attrs[0], default)
-    result = data
-    for attr in attrs[:-1]:
-        result = result.get(attr, {})
-    return result.get(attrs[-1], default)
+    return compile_path(chain)(data, default)
 
 
 def get(obj, key, default='n/a'):
-    try:
-        return _chain_get(obj, key, default)
-    except Exception:
-        return default
+    return _chain_get(obj, key, default)
 
 
 class NoKeyboardInterrupt:
@@ -159,50 +185,63 @@ def pre_exec():
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
-def run_script(command, capture=False, realtime=False, opts='', dry=False):
-    """When realtime == True, stderr will be redirected to stdout"""
-    logger.debug(f"Running subprocess: [{command}] (capture: {capture})")
-    if dry:
-        print(command)
-        return
-    preexec_options = {}
+def preexec_options():
+    options = {}
     if sys.platform.startswith('win'):
         # https://msdn.microsoft.com/en-us/library/windows/desktop/ms684863(v=vs.85).aspx
         # CREATE_NEW_PROCESS_GROUP=0x00000200 -> If this flag is specified, CTRL+C signals will be disabled
-        preexec_options['creationflags'] = 0x00000200
+        options['creationflags'] = 0x00000200
     else:
-        preexec_options['preexec_fn'] = lambda: signal.signal(signal.SIGINT, signal.SIG_IGN)
-    process = subprocess.Popen(
-        ['/bin/bash', f'-c{opts}', command],
+        options['preexec_fn'] = pre_exec
+    return options
+
+
+def run_script(command, capture=False, realtime=False, opts='', dry=False, fast_spawn=False):
+    """When realtime == True, stderr will be redirected to stdout
+
+    command: bash script, or argv list exec'ed as is.
+    Scripts using no shell features are exec'ed directly too (see _shell_free_argv).
+    fast_spawn: spawn those through posix_spawn/vfork (see popen), for short-lived probes only:
+    the child then doesn't ignore Ctrl+C. Ignored when realtime.
+    """
+    logger.debug(f"Running subprocess: [{command_str(command)}] (capture: {capture})")
+    if dry:
+        print(command_str(command))
+        return
+    text_options = {}
+    if not realtime:            # realtime output is read as raw chunks by StreamMultiplexer
+        text_options['encoding'] = 'utf-8'
+        text_options['bufsize'] = 1  # line buffered
+    process = popen(
+        command,
+        opts=opts,
+        fast_spawn=fast_spawn and not realtime,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT if realtime else subprocess.PIPE if capture else subprocess.DEVNULL,
-        encoding='utf-8',
-        bufsize=1,              # line buffered
-        **preexec_options,
+        **text_options,
     )
-    nbsr = None
+    mux = None
     try:
         if not realtime:
             stdout, stderr = process.communicate()
             rc = process.returncode
         else:
-            stdout, stderr = '', ''
-            last_n_lines = []
-            nbsr = NonBlockingStreamReader(process.stdout)
-            while True:
-                realtime_output = nbsr.readline(15)  # block 15s at most
-                if process.poll() is not None:
-                    break
-                if realtime_output:
-                    logger.debug(f"[{process.pid}:stdout] " + realtime_output.rstrip())
-                    echo(realtime_output.rstrip())
-                    last_n_lines.append(realtime_output.rstrip())
-                    last_n_lines = last_n_lines[-10:]
-                    sys.stdout.flush()
-                    if capture:
-                        stdout += realtime_output
-            rc = process.poll()
-            stdout, stderr = stdout.rstrip(), None if realtime else process.stderr.read().rstrip()
+            last_n_lines = deque(maxlen=10)
+            captured = []
+            log_lines = logger.isEnabledFor(logging.DEBUG)
+
+            def _on_line(line):
+                if log_lines:
+                    logger.debug(f"[{process.pid}:stdout] {line}")
+                last_n_lines.append(line)
+                if capture:
+                    captured.append(line)
+
+            mux = StreamMultiplexer()
+            mux.register(process.stdout, on_line=_on_line)
+            mux.run()
+            rc = process.wait()
+            stdout, stderr = '\n'.join(captured).rstrip(), None
         if rc:
             logger.critical(f"Subprocess Failed ({rc}): {os.linesep.join(last_n_lines).rstrip() if realtime else stderr}")
         if rc and not capture:
@@ -215,8 +254,117 @@ def run_script(command, capture=False, realtime=False, opts='', dry=False):
         with NoKeyboardInterrupt():
             process.wait()
     finally:
-        if nbsr:
-            nbsr.close()
+        if mux:
+            mux.close()
+
+
+_SHELL_CHARS = re.compile(r'[^\w \t@%+=:,./\'"-]')   # anything else may be a pipe, redirect, expansion ...
+
+@lru_cache(maxsize=256)
+def _which(program):
+    return shutil.which(program)
+
+def _shell_free_argv(command, opts=''):
+    """argv to exec directly if `command` uses no shell features (pipes, redirects, expansions ...), only words and quotes"""
+    if opts or sys.platform.startswith('win') or _SHELL_CHARS.search(command):
+        return None
+    try:
+        tokens = shlex.split(command)
+    except ValueError:          # unbalanced quotes, let bash report it
+        return None
+    if not tokens or '=' in tokens[0]:
+        return None
+    if not _which(tokens[0]):   # builtins, functions, aliases ...
+        return None
+    return tokens
+
+def command_str(command):
+    return command if isinstance(command, str) else shlex.join(command)
+
+def popen(command, opts='', fast_spawn=False, **kwargs):
+    """subprocess.Popen for a bash script or an argv list, without bash when possible
+
+    With `fast_spawn`, directly exec'ed commands skip preexec_fn (and fd closing) so that
+    subprocess can use posix_spawn or vfork instead of fork+exec. The child then doesn't
+    ignore Ctrl+C, which is fine for short-lived probes but not for interactive commands.
+    Spawn latency is logged and recorded as 'spawn.<program>' when timing is enabled.
+    """
+    argv = list(command) if not isinstance(command, str) else _shell_free_argv(command, opts)
+    if argv is None:
+        argv, options = ['/bin/bash', f'-c{opts}', command], preexec_options()
+    elif fast_spawn and not sys.platform.startswith('win'):
+        # posix_spawn needs an absolute executable
+        options = {'executable': _which(argv[0]) or argv[0], 'close_fds': False}
+    else:
+        options = preexec_options()
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, **options, **kwargs)
+    elapsed = time.perf_counter() - start
+    logger.debug(f"Spawned [{process.pid}] {argv[0]} in {elapsed * 1000:.2f}ms")
+    from .timeutils import registry as timing_registry
+    if timing_registry.enabled:
+        timing_registry.record(f'spawn.{os.path.basename(argv[0])}', elapsed)
+    return process
+
+
+ASYNC_CANCEL_GRACE = 1      # seconds a cancelled subprocess gets for each signal
+
+async def async_run_script(command, capture=False, opts='', timeout=None):
+    """asyncio flavor of run_script (without realtime mode)
+
+    argv lists and simple commands are exec'ed directly instead of through /bin/bash.
+    On timeout the subprocess is killed and asyncio.TimeoutError raised,
+    on cancellation it receives SIGINT like run_script does on Ctrl+C, then SIGTERM and SIGKILL
+    if it is still running after ASYNC_CANCEL_GRACE seconds (it ignores SIGINT, see pre_exec).
+    A program that can't be exec'ed gives rc 127, as bash would.
+    """
+    import asyncio              # slow to import, most commands never need it
+    logger.debug(f"Running subprocess (async): [{command_str(command)}] (capture: {capture})")
+    if not isinstance(command, str):
+        argv = list(command)
+    else:
+        argv = _shell_free_argv(command, opts) or ['/bin/bash', f'-c{opts}', command]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if capture else subprocess.DEVNULL,
+            **preexec_options(),
+        )
+    except OSError as e:
+        logger.critical(f"Subprocess Failed (127): {e}")
+        if not capture:
+            raise Exception(f"Subprocess Failed (127): {e}")
+        return 127, '', str(e)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Subprocess [{process.pid}] timed out ({timeout}s): [{command_str(command)}]")
+        process.kill()
+        await process.wait()
+        raise
+    except asyncio.CancelledError:
+        logger.info("Sending SIGINT to subprocess ..")
+        process.send_signal(signal.SIGINT)
+        logger.info("Waiting subprocess to exit gracefully..")
+        for stop in (process.terminate, process.kill):
+            try:
+                await asyncio.wait_for(asyncio.shield(process.wait()), ASYNC_CANCEL_GRACE)
+                break
+            except asyncio.TimeoutError:
+                logger.info(f"Subprocess [{process.pid}] still running, {stop.__name__} ..")
+                stop()
+        await process.wait()
+        raise
+    rc = process.returncode
+    stdout = stdout.decode('utf-8')
+    if stderr is not None:
+        stderr = stderr.decode('utf-8')
+    if rc:
+        logger.critical(f"Subprocess Failed ({rc}): {stderr}")
+    if rc and not capture:
+        raise Exception(f"Subprocess Failed ({rc}): {stderr}")
+    return rc, stdout, stderr
 
 # annotation
 def as_root(func):
@@ -273,13 +421,6 @@ def assert_that(condition_to_fulfill, msg):
 def utc_to_local(utc_dt):
     return utc_dt.replace(tzinfo=timezone.utc).astimezone(tz=None)
 
-def cached(func):
-    obj = None
-
-    @wraps(func)
-    def inner(*args, **kwargs):
-        nonlocal obj
-        if obj is None:
-            obj = func(*args, **kwargs)
-        return obj
-    return inner
+def cached(func=None, **options):
+    """Cache results by arguments, options: ttl, maxsize, persist, key (see cacheutils.memoize)"""
+    return memoize(func, **options)
@@ -0,0 +1,112 @@
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler which never blocks the caller, records are counted and dropped when the queue is full"""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.setFormatter(logging.Formatter('%(message)s'))  # real formatting happens on the listener thread
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler able to write a batch of records with one write, one rollover check and one flush"""
+
+    def emit_batch(self, records):
+        records = [record for record in records if record.levelno >= self.level and self.filter(record)]
+        if not records:
+            return
+        self.acquire()
+        try:
+            text = ''.join(self.format(record) + self.terminator for record in records)
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + len(text) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(text)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class BatchQueueListener(QueueListener):
+    """QueueListener draining up to `batch_size` queued records per wakeup"""
+
+    def __init__(self, queue, *handlers, batch_size=BATCH_SIZE):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def _handle_batch(self, records):
+        for handler in self.handlers:
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._sentinel in batch
+            if stop:
+                batch = batch[:batch.index(self._sentinel)]
+            self._handle_batch(batch)
+            for _ in range(len(batch) + stop):
+                q.task_done()
+            if stop:
+                return
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # block rather than lose the sentinel when the queue is full
+
+
+def start_async_logging(*handlers, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+    """Move `handlers` off the calling thread
+
+    Return the DroppingQueueHandler to be attached to loggers. Queued records
+    are flushed (and the number of dropped ones reported) at exit.
+    """
+    q = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(q)
+    listener = BatchQueueListener(q, *handlers, batch_size=batch_size)
+    listener.start()
+
+    def _stop():
+        listener.stop()
+        if queue_handler.dropped:
+            for handler in handlers:
+                handler.handle(logging.makeLogRecord({
+                    'name': __name__,
+                    'levelno': logging.WARNING,
+                    'levelname': logging.getLevelName(logging.WARNING),
+                    'msg': f"{queue_handler.dropped} log records dropped (queue full)",
+                }))
+        for handler in handlers:
+            handler.flush()
+
+    atexit.register(_stop)
+    return queue_handler
@@ -0,0 +1,192 @@
+import os
+import json
+import stat
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+_MISSING = object()
+
+
+def _check_owned(path):
+    """Refuse a cache path another user could have planted (or may write to)"""
+    if not hasattr(os, 'getuid'):
+        return
+    st = os.lstat(path)
+    if st.st_uid != os.getuid() or stat.S_ISLNK(st.st_mode):
+        raise PermissionError(f"{path} is not owned by the current user")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(path, 0o700 if stat.S_ISDIR(st.st_mode) else 0o600)
+
+
+def cache_dir():
+    """Per-user cache directory ($XDG_CACHE_HOME/corgi or ~/.cache/corgi), private to its owner"""
+    path = os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'corgi')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_owned(path)
+    return path
+
+
+def default_cache_file():
+    return os.path.join(cache_dir(), 'cache.sqlite')
+
+
+def _make_key(args, kwargs):
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+    try:
+        hash(key)
+        return key
+    except TypeError:           # unhashable arguments (dict, list ...)
+        return repr(key)
+
+
+class LRUCache:
+    """In-memory LRU store whose entries may expire"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return _MISSING
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, None if ttl is None else time.time() + ttl)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteCache:
+    """On-disk store shared across CLI invocations, values are stored as JSON
+
+    Values must be JSON serializable (tuples come back as lists), others are not cached.
+    """
+
+    def __init__(self, namespace, filename=None, maxsize=None):
+        self.namespace = namespace
+        self.filename = filename or default_cache_file()
+        self.maxsize = maxsize
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            if os.path.exists(self.filename):
+                _check_owned(self.filename)
+            self._conn = sqlite3.connect(self.filename, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'ns TEXT, key TEXT, value TEXT, expires REAL, accessed REAL, PRIMARY KEY (ns, key))')
+            _check_owned(self.filename)
+        return self._conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            row = self._db().execute(
+                'SELECT value, expires FROM cache WHERE ns = ? AND key = ?', (self.namespace, repr(key))).fetchone()
+            if row is None:
+                return _MISSING
+            value, expires = row
+            if expires is not None and expires < now:
+                self._db().execute('DELETE FROM cache WHERE ns = ? AND key = ?', (self.namespace, repr(key)))
+                return _MISSING
+            if self.maxsize is not None:
+                self._db().execute(
+                    'UPDATE cache SET accessed = ? WHERE ns = ? AND key = ?', (now, self.namespace, repr(key)))
+            return json.loads(value)
+        except Exception as e:
+            logger.warning(f"Cache read failed ({self.namespace}): {e}")
+            return _MISSING
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            db = self._db()
+            db.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, repr(key), json.dumps(value), None if ttl is None else now + ttl, now))
+            if self.maxsize is not None:
+                db.execute(
+                    'DELETE FROM cache WHERE ns = ? AND key NOT IN '
+                    '(SELECT key FROM cache WHERE ns = ? ORDER BY accessed DESC LIMIT ?)',
+                    (self.namespace, self.namespace, self.maxsize))
+        except Exception as e:
+            logger.warning(f"Cache write failed ({self.namespace}): {e}")
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache WHERE ns = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM cache WHERE ns = ?', (self.namespace,)).fetchone()[0]
+
+
+def memoize(func=None, *, ttl=None, maxsize=128, persist=False, key=None):
+    """Cache results by arguments
+
+    ttl: seconds before an entry expires (None: never)
+    maxsize: max entries, least recently used ones are evicted (None: unbounded)
+    persist: keep entries (JSON serializable ones) in a sqlite file under the user's cache dir,
+             so they survive across invocations
+    key: callable(*args, **kwargs) building the cache key, required when arguments
+         don't identify the result by themselves (or, when persisting, have no stable repr)
+
+    The wrapped function gets `cache_info()` and `cache_clear()`, like functools.lru_cache.
+    """
+    def decorator(f):
+        namespace = f'{f.__module__}.{f.__qualname__}'
+        store = SqliteCache(namespace, maxsize=maxsize) if persist else LRUCache(maxsize)
+        stats = {'hits': 0, 'misses': 0}
+
+        @wraps(f)
+        def inner(*args, **kwargs):
+            k = key(*args, **kwargs) if key else _make_key(args, kwargs)
+            value = store.get(k)
+            if value is not _MISSING:
+                stats['hits'] += 1
+                return value
+            stats['misses'] += 1
+            value = f(*args, **kwargs)
+            store.set(k, value, ttl)
+            return value
+
+        def cache_info():
+            return CacheInfo(stats['hits'], stats['misses'], maxsize, len(store))
+
+        def cache_clear():
+            store.clear()
+            stats['hits'] = stats['misses'] = 0
+
+        inner.cache_info = cache_info
+        inner.cache_clear = cache_clear
+        return inner
+
+    if func is not None:        # used as bare @memoize
+        return decorator(func)
+    return decorator
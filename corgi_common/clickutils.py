@@ -0,0 +1,36 @@
+import importlib
+import logging
+import click
+
+logger = logging.getLogger(__name__)
+
+
+class LazyGroup(click.Group):
+    """click group whose subcommands are imported only when invoked
+
+    > @click.group(cls=LazyGroup, lazy_subcommands={'s3': 'corgi_aws.s3.s3'})
+    > def cli():
+    >     pass
+
+    `lazy_subcommands` maps command name to 'module.attribute' of the command object.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name):
+        module_name, attr = self.lazy_subcommands[cmd_name].rsplit('.', 1)
+        logger.debug(f"Loading subcommand [{cmd_name}] from {module_name}")
+        cmd = getattr(importlib.import_module(module_name), attr)
+        if not isinstance(cmd, click.Command):
+            raise ValueError(f"Lazy loading of {self.lazy_subcommands[cmd_name]} failed by returning a non-command object")
+        return cmd
@@ -0,0 +1,180 @@
+"""Compressed columnar storage for metrics and analysis results
+
+A dataset is a directory, each writer session appends to it:
+- with pyarrow installed: one parquet file per session, one row group per flush
+- otherwise: numpy compressed `chunk-NNNNN.npz` files, indexed by `meta.json`
+  (columns and time range of every chunk, so readers skip chunks they don't need)
+
+Numeric columns are stored as float64 (missing values as nan), others as strings.
+"""
+import os
+import json
+import glob
+import math
+import logging
+from .samplingutils import Sink
+
+logger = logging.getLogger(__name__)
+
+ROW_GROUP_SIZE = 4096
+META_FILE = 'meta.json'
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _column_type(v):
+    return 'float64' if isinstance(v, (int, float)) and not isinstance(v, bool) else 'string'
+
+
+def _cell(v, kind):
+    if kind == 'string':
+        return '' if v is None else str(v)
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else math.nan
+
+
+class ColumnarWriter:
+    """Buffer rows (dicts) and write them as compressed column chunks of `row_group_size` rows
+
+    Columns are fixed by the first row.
+    engine: parquet | npz (default: parquet when pyarrow is available)
+    """
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE, engine=None):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.engine = engine or ('parquet' if _has_pyarrow() else 'npz')
+        self.columns = None
+        self.types = None
+        self._buffers = None
+        self._parquet_writer = None
+        os.makedirs(path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, row):
+        if self.columns is None:
+            self.columns = list(row)
+            self.types = {c: _column_type(row[c]) for c in self.columns}
+            self._buffers = {c: [] for c in self.columns}
+        for c in self.columns:
+            self._buffers[c].append(_cell(row.get(c), self.types[c]))
+        if len(self._buffers[self.columns[0]]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns or not self._buffers[self.columns[0]]:
+            return
+        if self.engine == 'parquet':
+            self._flush_parquet()
+        else:
+            self._flush_npz()
+        self._buffers = {c: [] for c in self.columns}
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self._parquet_writer is None:
+            schema = pa.schema([(c, pa.float64() if self.types[c] == 'float64' else pa.string()) for c in self.columns])
+            n = len(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+            filename = os.path.join(self.path, f'part-{n:05d}.parquet')
+            self._parquet_writer = pq.ParquetWriter(filename, schema, compression='zstd')
+        self._parquet_writer.write_table(pa.table(self._buffers, schema=self._parquet_writer.schema))
+
+    def _flush_npz(self):
+        import numpy as np
+        meta_file = os.path.join(self.path, META_FILE)
+        meta = {'chunks': []}
+        if os.path.isfile(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+        filename = f"chunk-{len(meta['chunks']):05d}.npz"
+        arrays = {
+            f'c{i}': np.asarray(self._buffers[c], dtype=np.float64 if self.types[c] == 'float64' else np.str_)
+            for i, c in enumerate(self.columns)
+        }
+        np.savez_compressed(os.path.join(self.path, filename), **arrays)
+        chunk = {'file': filename, 'rows': len(self._buffers[self.columns[0]]), 'columns': self.columns}
+        times = [t for t in self._buffers.get('time', []) if not math.isnan(t)] if self.types.get('time') == 'float64' else []
+        if times:
+            chunk['time'] = [min(times), max(times)]
+        meta['chunks'].append(chunk)
+        tmp = meta_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_file)
+
+    def close(self):
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def _read_parquet(path, columns, start, end, time_column):
+    import pyarrow.parquet as pq
+    filters = []
+    if start is not None:
+        filters.append((time_column, '>=', start))
+    if end is not None:
+        filters.append((time_column, '<', end))
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return {c: table.column(c).to_numpy() for c in table.column_names}
+
+
+def _read_npz(path, columns, start, end, time_column):
+    import numpy as np
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    parts = {}
+    for chunk in meta['chunks']:
+        t0, t1 = chunk.get('time', (None, None))
+        if t0 is not None and ((start is not None and t1 < start) or (end is not None and t0 >= end)):
+            continue
+        keys = {c: f'c{i}' for i, c in enumerate(chunk['columns'])}
+        wanted = columns or chunk['columns']
+        with np.load(os.path.join(path, chunk['file'])) as npz:
+            mask = None
+            if (start is not None or end is not None) and time_column in keys:
+                times = npz[keys[time_column]]
+                mask = np.ones(len(times), dtype=bool)
+                if start is not None:
+                    mask &= times >= start
+                if end is not None:
+                    mask &= times < end
+            for c in wanted:
+                values = npz[keys[c]] if c in keys else np.full(chunk['rows'], np.nan)
+                parts.setdefault(c, []).append(values if mask is None else values[mask])
+    return {c: np.concatenate(arrays) for c, arrays in parts.items()}
+
+
+def read_columnar(path, columns=None, start=None, end=None, time_column='time'):
+    """Load a dataset written by ColumnarWriter as {column: numpy array}
+
+    Only `columns` (default: all) are read; start/end (epoch seconds, end excluded)
+    filter rows on `time_column`.
+    """
+    reader = _read_parquet if glob.glob(os.path.join(path, '*.parquet')) else _read_npz
+    return reader(path, list(columns) if columns else None, start, end, time_column)
+
+
+class ColumnarSink(Sink):
+    """Sampler sink appending samples (with a 'time' column) to a columnar dataset"""
+
+    def __init__(self, path, row_group_size=360):  # small groups: don't lose hours of samples if killed
+        self.writer = ColumnarWriter(path, row_group_size=row_group_size)
+
+    def write(self, ts, row):
+        self.writer.write({'time': ts, **row})
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,214 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
+from .timeutils import LatencyHistogram, registry as timing_registry
+
+logger = logging.getLogger(__name__)
+
+IO_WORKERS = int(os.getenv('CORGI_IO_WORKERS', 0)) or min(32, (os.cpu_count() or 1) * 4)
+CPU_WORKERS = int(os.getenv('CORGI_CPU_WORKERS', 0)) or (os.cpu_count() or 1)
+PENDING_PER_WORKER = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class BoundedExecutor:
+    """Thread/process pool whose submit() blocks once `max_pending` tasks are queued or running
+
+    Keeps counters and latency histograms, see metrics().
+    """
+
+    def __init__(self, name, max_workers, kind='thread', max_pending=None):
+        assert kind in ('thread', 'process'), kind
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * PENDING_PER_WORKER
+        if kind == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('submitted', 'started', 'completed', 'failed', 'cancelled', 'timed_out'), 0)
+        self._wait = LatencyHistogram()      # queued -> started (thread pools only)
+        self._latency = LatencyHistogram()   # submitted -> done
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counters[key] += n
+
+    def _track_start(self, fn, submitted_at):
+        def _run(*args, **kwargs):
+            now = time.perf_counter()
+            with self._lock:
+                self._counters['started'] += 1
+                self._wait.record((now - submitted_at) * 1e9)
+            return fn(*args, **kwargs)
+        return _run
+
+    def _on_done(self, submitted_at, future):
+        self._slots.release()
+        elapsed = time.perf_counter() - submitted_at
+        with self._lock:
+            if future.cancelled():
+                self._counters['cancelled'] += 1
+                return
+            self._counters['completed' if future.exception() is None else 'failed'] += 1
+            self._latency.record(elapsed * 1e9)
+        if timing_registry.enabled:
+            timing_registry.record(f'executor.{self.name}', elapsed)
+
+    def submit(self, fn, *args, **kwargs):
+        """Like Executor.submit, but blocks while the executor is full (backpressure)"""
+        self._slots.acquire()
+        submitted_at = time.perf_counter()
+        try:
+            task = self._track_start(fn, submitted_at) if self.kind == 'thread' else fn  # processes need picklable fn
+            future = self._executor.submit(task, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._count('submitted')
+        future.add_done_callback(lambda f: self._on_done(submitted_at, f))
+        return future
+
+    def _outcome(self, future, deadline, return_exceptions):
+        try:
+            return future.result(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        except TimeoutError as e:
+            future.cancel()     # a running thread can't be interrupted, it just won't be waited for
+            self._count('timed_out')
+            if return_exceptions:
+                return e
+            raise
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    def _fill(self, fn, items, pending, timeout, add):
+        while len(pending) < self.max_pending:
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            deadline = None if timeout is None else time.monotonic() + timeout
+            add(item, self.submit(fn, item), deadline)
+
+    def map(self, fn, iterable, timeout=None, return_exceptions=False):
+        """Yield fn(item) in input order, at most `max_pending` items are in flight
+
+        timeout: seconds allowed to each task since its submission (TimeoutError)
+        return_exceptions: yield exceptions instead of raising them
+        Pending tasks are cancelled on Ctrl-C or when the generator is closed early.
+        """
+        items = iter(iterable)
+        pending = deque()
+        try:
+            while True:
+                self._fill(fn, items, pending, timeout, lambda item, f, d: pending.append((f, d)))
+                if not pending:
+                    return
+                future, deadline = pending.popleft()
+                yield self._outcome(future, deadline, return_exceptions)
+        finally:
+            self._cancel(f for f, _ in pending)
+
+    def map_unordered(self, fn, iterable, timeout=None, return_exceptions=False):
+        """Yield (item, fn(item)) as tasks complete, same options as map()"""
+        items = iter(iterable)
+        pending = {}
+        try:
+            while True:
+                self._fill(fn, items, pending, timeout, lambda item, f, d: pending.__setitem__(f, (item, d)))
+                if not pending:
+                    return
+                deadlines = [d for _, d in pending.values() if d is not None]
+                wait_for = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                expired = [f for f, (_, d) in pending.items() if f not in done and d is not None and d <= now]
+                for future in list(done) + expired:
+                    item, deadline = pending.pop(future)
+                    yield item, self._outcome(future, deadline, return_exceptions)
+        finally:
+            self._cancel(pending)
+
+    def _cancel(self, futures):
+        cancelled = sum(f.cancel() for f in futures)
+        if cancelled:
+            logger.debug(f"[{self.name}] cancelled {cancelled} pending task(s)")
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+            wait_summary = self._wait.summary()
+            latency_summary = self._latency.summary()
+        done = counters['completed'] + counters['failed'] + counters['cancelled']
+        in_flight = counters['submitted'] - done
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            **counters,
+            'in_flight': in_flight,
+            'queue_depth': counters['submitted'] - counters['started'] - counters['cancelled'] if self.kind == 'thread' else None,
+            'wait_p99_ms': wait_summary['p99'] / 1e6,
+            'latency_p50_ms': latency_summary['p50'] / 1e6,
+            'latency_p99_ms': latency_summary['p99'] / 1e6,
+            'latency_max_ms': latency_summary['max'] / 1e6,
+        }
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+_DEFAULTS = {
+    'io': ('thread', lambda: IO_WORKERS),
+    'cpu': ('process', lambda: CPU_WORKERS),
+}
+
+
+def get_executor(name='io', max_workers=None, kind=None, max_pending=None):
+    """Named executor shared by the whole process, created on first use
+
+    'io' is a thread pool for blocking calls (REST, AWS, subprocesses),
+    'cpu' a process pool; other names default to thread pools of IO_WORKERS.
+    Arguments are only used by the call creating the executor.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                default_kind, default_workers = _DEFAULTS.get(name, ('thread', lambda: IO_WORKERS))
+                executor = _executors[name] = BoundedExecutor(
+                    name, max_workers or default_workers(), kind=kind or default_kind, max_pending=max_pending)
+    return executor
+
+
+def bounded_map(fn, iterable, executor='io', timeout=None, return_exceptions=False):
+    """fn over iterable on a named executor, results in input order"""
+    return get_executor(executor).map(fn, iterable, timeout=timeout, return_exceptions=return_exceptions)
+
+
+def bounded_map_unordered(fn, iterable, executor='io', timeout=None, return_exceptions=False):
+    """fn over iterable on a named executor, (item, result) in completion order"""
+    return get_executor(executor).map_unordered(fn, iterable, timeout=timeout, return_exceptions=return_exceptions)
+
+
+def executor_metrics():
+    return [e.metrics() for e in list(_executors.values())]
+
+
+@atexit.register
+def _shutdown():
+    for executor in list(_executors.values()):
+        executor.shutdown(wait=False, cancel_futures=True)
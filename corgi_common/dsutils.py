@@ -1,18 +1,37 @@
+from collections.abc import Iterable
 from icecream import Source
 import inspect
 
+LEAF_TYPES = (str, bytes, bytearray, dict)
+
+
+def iflatten(L, leaf_types=LEAF_TYPES, containers=None):
+    """Yield leaves of arbitrarily nested iterables, depth first and without recursion
+
+    containers: types to descend into (default: any iterable not in `leaf_types`)
+    """
+    stack = [iter((L,))]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, containers) if containers else (isinstance(item, Iterable) and not isinstance(item, leaf_types)):
+                stack.append(iter(item))
+                break
+            yield item
+        else:
+            stack.pop()
+
+
 def flatten0(L):
-    if not isinstance(L, (list, tuple, set)):
-        yield L
-        return
-    for F in L:
-        yield from flatten(F)
+    return iflatten(L, containers=(list, tuple, set))
 
 
 def flatten(L):
     return list(flatten0(L))
 
 
+_kdict_call_sites = {}
+
+
 def kdict(*args, **kwargs):
     """
     create dict only by key
@@ -25,11 +44,75 @@ def kdict(*args, **kwargs):
     """
     assert not kwargs, "kwargs not allowed"
     callFrame = inspect.currentframe().f_back
-    callNode = Source.executing(callFrame).node
-    source = Source.for_frame(callFrame)
-    tokens = source.asttokens()
-    argStrs = [
-        tokens.get_text(node)
-        for node in callNode.args
-    ]
+    site = (callFrame.f_code, callFrame.f_lasti)
+    argStrs = _kdict_call_sites.get(site)
+    if argStrs is None:         # parse caller source only once per call site
+        callNode = Source.executing(callFrame).node
+        source = Source.for_frame(callFrame)
+        tokens = source.asttokens()
+        argStrs = _kdict_call_sites[site] = [
+            tokens.get_text(node)
+            for node in callNode.args
+        ]
     return dict(zip(argStrs, args))
+
+
+class CompiledPath:
+    """Accessor for a dotted path like 'a.b.0.c', digits index into lists/tuples"""
+
+    __slots__ = ('path', '_steps')
+
+    def __init__(self, path):
+        self.path = path
+        self._steps = tuple((key, int(key) if key.lstrip('-').isdigit() else None) for key in path.split('.'))
+
+    def __call__(self, obj, default=None):
+        try:
+            for key, index in self._steps:
+                if index is not None and isinstance(obj, (list, tuple)):
+                    obj = obj[index]
+                else:
+                    obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            return default
+        return obj
+
+    def __repr__(self):
+        return f"CompiledPath({self.path!r})"
+
+
+_MAX_COMPILED_PATHS = 4096
+_compiled_paths = {}
+
+
+def compile_path(path):
+    """
+    compile (and cache) a dotted path accessor
+
+    > path = compile_path('connections.current')
+    > path(server_status)
+    > path(server_status, default=0)
+
+    """
+    compiled = _compiled_paths.get(path)
+    if compiled is None:
+        if len(_compiled_paths) >= _MAX_COMPILED_PATHS:
+            _compiled_paths.clear()
+        compiled = _compiled_paths[path] = CompiledPath(path)
+    return compiled
+
+
+def extract_many(records, paths, default=None):
+    """
+    extract several dotted paths from records in one pass, columnar
+
+    > extract_many([{'a': {'b': 1}}, {'a': {'b': 2}}], ['a.b', 'c'])
+    > {'a.b': [1, 2], 'c': [None, None]}
+
+    """
+    columns = {path: [] for path in paths}
+    getters = [(columns[path].append, compile_path(path)) for path in paths]
+    for record in records:
+        for append, getter in getters:
+            append(getter(record, default))
+    return columns
@@ -1,11 +1,73 @@
-from jinja2 import FileSystemLoader, Environment
+from jinja2 import FileSystemLoader, ModuleLoader, ChoiceLoader, Environment, FileSystemBytecodeCache
 import os
-import inspect
+import sys
+import logging
+from functools import lru_cache
+from .pathutils import caller_globals
+
+logger = logging.getLogger(__name__)
+
+COMPILED_DIR = '__compiled__'   # precompiled templates, shipped next to the sources
+
+
+def _template_files(templates_path):
+    for root, _dirs, files in os.walk(templates_path):
+        if COMPILED_DIR in root.split(os.sep):
+            continue
+        for f in files:
+            yield os.path.join(root, f)
+
+
+def _compiled_is_fresh(templates_path):
+    compiled_path = os.path.join(templates_path, COMPILED_DIR)
+    if not os.path.isdir(compiled_path):
+        return False
+    compiled_at = os.path.getmtime(compiled_path)
+    return all(os.path.getmtime(f) <= compiled_at for f in _template_files(templates_path))
+
+
+@lru_cache(maxsize=None)
+def _bytecode_cache():
+    # jinja2's default directory is per user, 0700 and ownership checked (bytecode is marshal loaded)
+    return FileSystemBytecodeCache()
+
+
+@lru_cache(maxsize=None)
+def get_environment(templates_path):
+    """One Environment per template directory
+
+    Precompiled templates (see precompile_templates) are used when they are not
+    older than the sources, otherwise templates are loaded from files with their
+    bytecode cached in a per-user directory across runs.
+    """
+    loader = FileSystemLoader(templates_path)
+    if _compiled_is_fresh(templates_path):
+        logger.debug(f"Using precompiled templates in {templates_path}")
+        loader = ChoiceLoader([ModuleLoader(os.path.join(templates_path, COMPILED_DIR)), loader])
+    return Environment(loader=loader, autoescape=True, bytecode_cache=_bytecode_cache())
+
+
+def render(templates_path, template_filename, **values):
+    return get_environment(os.path.realpath(templates_path)).get_template(template_filename).render(**values)
+
 
 def get_rendered(template_filename, **values):
-    frm = inspect.stack()[1]
-    mod = inspect.getmodule(frm[0])
-    templates_path = os.path.join(os.path.dirname(mod.__file__), "templates")
+    templates_path = os.path.join(os.path.dirname(caller_globals()['__file__']), "templates")
+    return render(templates_path, template_filename, **values)
+
+
+def precompile_templates(templates_path):
+    """Compile all templates in `templates_path` into python modules under its __compiled__ dir"""
     env = Environment(loader=FileSystemLoader(templates_path), autoescape=True)
-    tmpl = env.get_template(template_filename)
-    return tmpl.render(**values)
+    target = os.path.join(templates_path, COMPILED_DIR)
+    os.makedirs(target, exist_ok=True)
+    env.compile_templates(target, zip=None, ignore_errors=False,
+                          filter_func=lambda name: COMPILED_DIR not in name.split('/'))
+    os.utime(target)
+    return target
+
+
+if __name__ == '__main__':
+    # python -m corgi_common.jinja2utils corgi_aws/templates corgi_build/templates ...
+    for path in sys.argv[1:]:
+        print(f"Precompiled {path} => {precompile_templates(path)}")
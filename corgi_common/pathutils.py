@@ -1,13 +1,19 @@
 import os
-import inspect
+import sys
+
+
+def caller_globals(depth=1):
+    """Globals of the module calling the function which calls this one (depth=1)
+
+    Cheap replacement of inspect.stack()/inspect.getmodule(): no frame records,
+    no source context lookup.
+    """
+    return sys._getframe(depth + 1).f_globals
 
 def get_local_file_path(filename):
-    frm = inspect.stack()[1]
-    mod = inspect.getmodule(frm[0])
-    return os.path.join(get_module_path(mod), filename)
+    return os.path.join(os.path.dirname(caller_globals()['__file__']), filename)
 
 def get_module_path(mod=None):
     if not mod:
-        frm = inspect.stack()[1]
-        mod = inspect.getmodule(frm[0])
+        return os.path.dirname(caller_globals()['__file__'])
     return os.path.dirname(mod.__file__)
@@ -0,0 +1,173 @@
+import os
+import sys
+import atexit
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+import __main__
+from click import echo
+
+STARTUP_PROFILE_OPTION = '--startup-profile'
+
+
+def _self_command():
+    spec = getattr(__main__, '__spec__', None)
+    if spec and spec.name:      # python -m package.module
+        return ['-m', spec.name]
+    return [sys.argv[0]]
+
+
+def _parse_import_time(lines):
+    """Parse `python -X importtime` lines: 'import time: self [us] | cumulative | imported package'"""
+    rows = []
+    for line in lines:
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():  # header
+            continue
+        rows.append({
+            'self': int(self_us) / 1000,
+            'cumulative': int(cumulative_us) / 1000,
+            'module': name.rstrip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return rows
+
+
+def report_import_time(top=30):
+    """Re-run current command under `python -X importtime` and print where startup time goes"""
+    argv = [sys.executable, '-X', 'importtime', *_self_command(), *sys.argv[1:]]
+    process = subprocess.Popen(argv, stderr=subprocess.PIPE, encoding='utf-8')
+    import_lines = []
+    for line in process.stderr:
+        if line.startswith('import time:'):
+            import_lines.append(line)
+        else:
+            echo(line, nl=False, err=True)
+    rc = process.wait()
+    rows = _parse_import_time(import_lines)
+    from hprint import pretty_print
+    echo(f"\n===== Startup imports (top {top} by cumulative time) =====", err=True)
+    output = pretty_print(sorted(rows, key=lambda r: r['cumulative'], reverse=True)[:top], mappings={
+        'Module': 'module',
+        'Depth': 'depth',
+        'Self (ms)': ('self', lambda v: f'{v:.1f}'),
+        'Cumulative (ms)': ('cumulative', lambda v: f'{v:.1f}'),
+    }, raw=True)
+    echo(output, err=True)
+    total = sum(r['self'] for r in rows)
+    echo(f"(total: {len(rows)} modules, {total:.1f}ms)", err=True)
+    sys.exit(rc)
+
+
+PROFILE_OPTION = '--profile'
+PROFILE_TOP = 30
+SAMPLING_INTERVAL = 0.005
+
+
+def _profile_file(name, suffix):
+    return os.path.join(tempfile.gettempdir(), f'{name}_{os.getpid()}.{suffix}')
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of all threads' stacks from a background thread, output as collapsed stacks"""
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='corgi-sampler', daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def hotspots(self, top=PROFILE_TOP):
+        inclusive, exclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            for frame in set(frames):
+                inclusive[frame] += count
+            if frames:
+                exclusive[frames[-1]] += count
+        total = sum(self.stacks.values()) or 1
+        return [
+            {'function': frame, 'total': count / total * 100, 'self': exclusive[frame] / total * 100}
+            for frame, count in inclusive.most_common(top)
+        ]
+
+
+def _report_cprofile(profiler, name, top):
+    import pstats
+    profiler.disable()
+    filename = _profile_file(name, 'prof')
+    profiler.dump_stats(filename)
+    echo(f"\n===== cProfile (top {top} by cumulative time) =====", err=True)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(top)
+    echo(f"(profile saved to {filename}, open with `python -m pstats` or snakeviz)", err=True)
+
+
+def _report_sampling(profiler, name, top):
+    profiler.stop()
+    filename = _profile_file(name, 'collapsed')
+    profiler.dump(filename)
+    from hprint import pretty_print
+    echo(f"\n===== Sampling profile (top {top} by inclusive samples, {profiler.samples} samples) =====", err=True)
+    output = pretty_print(profiler.hotspots(top), mappings={
+        'Function': 'function',
+        'Total %': ('total', lambda v: f'{v:.1f}'),
+        'Self %': ('self', lambda v: f'{v:.1f}'),
+    }, raw=True)
+    echo(output, err=True)
+    echo(f"(collapsed stacks saved to {filename}, render with flamegraph.pl or speedscope)", err=True)
+
+
+def start_profiling_from_argv(name, top=None):
+    """Handle `--profile[=cprofile|sampling]` (removed from sys.argv): profile the rest
+    of the process and report hotspots at exit"""
+    mode = None
+    for arg in list(sys.argv[1:]):
+        if arg == PROFILE_OPTION or arg.startswith(PROFILE_OPTION + '='):
+            sys.argv.remove(arg)
+            mode = arg.partition('=')[2] or 'cprofile'
+            break
+    if mode is None:
+        return
+    if mode not in ('cprofile', 'sampling'):
+        echo(f"Unknown profiler {mode} (choices: cprofile, sampling)", err=True)
+        sys.exit(2)
+    top = top or int(os.getenv('CORGI_PROFILE_TOP', PROFILE_TOP))
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        atexit.register(_report_cprofile, profiler, name, top)
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler()
+        atexit.register(_report_sampling, profiler, name, top)
+        profiler.start()
@@ -1,9 +1,66 @@
 import requests
+import logging
+import threading
 from contextlib import redirect_stdout
 import sys
+from urllib.parse import urlsplit
 from functools import partial
 from click import echo
 from qqutils import hprint
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .timeutils import registry as timing_registry
+from .concurrency import bounded_map
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 16           # number of per-host pools kept alive
+POOL_MAXSIZE = 32               # connections kept per host
+RETRIES = 3
+BACKOFF_FACTOR = 0.3            # sleep 0.3s, 0.6s, 1.2s ... between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _timing_hook(r, *args, **kwargs):
+    host = urlsplit(r.url).netloc
+    logger.debug(f"{r.request.method} {r.url} => {r.status_code} ({r.elapsed.total_seconds():.3f}s)")
+    if timing_registry.enabled:
+        timing_registry.record(f'http.{r.request.method} {host}', r.elapsed.total_seconds())
+
+
+def new_session(
+        retries=RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES,
+        pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, verify=True,
+) -> requests.Session:
+    """Session keeping connections alive in per-host pools, retrying idempotent requests with backoff"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        raise_on_status=False,  # hand the last response to the caller
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    s = requests.Session()
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    s.verify = verify
+    s.headers['Accept-Encoding'] = 'gzip, deflate'
+    s.hooks['response'].append(_timing_hook)
+    return s
+
+
+def session() -> requests.Session:
+    """Process-wide session shared by http_* helpers"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = new_session()
+    return _session
+
 
 def _check_response(r):
     if r.ok:
@@ -18,7 +75,7 @@ def _check_response(r):
 
 def _http_method(url, method, *args, **kwargs):
     assert method in ['get', 'post', 'delete', 'put']
-    response = getattr(requests, method)(url, *args, **kwargs)
+    response = getattr(session(), method)(url, *args, **kwargs)
     _check_response(response)
     return response
 
@@ -27,3 +84,11 @@ http_get = partial(_http_method, method='get')
 http_post = partial(_http_method, method='post')
 http_put = partial(_http_method, method='put')
 http_delete = partial(_http_method, method='delete')
+
+
+def map_get(urls, timeout=None, **kwargs):
+    """GET `urls` concurrently (shared io executor) over the shared session, return responses in the same order"""
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [http_get(url, timeout=timeout, **kwargs) for url in urls]
+    return list(bounded_map(lambda url: http_get(url, timeout=timeout, **kwargs), urls))
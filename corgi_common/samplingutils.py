@@ -0,0 +1,311 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import logging
+from array import array
+from datetime import datetime
+from click import echo
+
+logger = logging.getLogger(__name__)
+
+CAPACITY = 3600
+NAN = float('nan')
+
+
+class RingBuffer:
+    """Fixed capacity numeric time series, one preallocated array('d') per column
+
+    Values which are not numbers (or are missing from a sample) are stored as nan.
+    """
+
+    def __init__(self, columns, capacity=CAPACITY):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        self._times = array('d', [NAN]) * capacity
+        self._data = [array('d', [NAN]) * capacity for _ in self.columns]
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, ts, values):
+        """values: dict by column name"""
+        i = self._next
+        self._times[i] = ts
+        for column, data in zip(self.columns, self._data):
+            v = values.get(column)
+            data[i] = v if isinstance(v, (int, float)) and not isinstance(v, bool) else NAN
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _positions(self, last=None):
+        n = self._size if last is None else min(last, self._size)
+        start = self._next - n
+        return [(start + k) % self.capacity for k in range(n)]
+
+    def timestamps(self, last=None):
+        return [self._times[i] for i in self._positions(last)]
+
+    def column(self, name, last=None):
+        """Values of `name`, oldest first"""
+        data = self._data[self._index[name]]
+        return [data[i] for i in self._positions(last)]
+
+    def latest(self):
+        if not self._size:
+            return None, {}
+        i = (self._next - 1) % self.capacity
+        return self._times[i], {c: data[i] for c, data in zip(self.columns, self._data)}
+
+    def delta(self, name):
+        """Change of `name` between the last two samples (nan if unknown)"""
+        if self._size < 2:
+            return NAN
+        prev, cur = self.column(name, last=2)
+        return cur - prev
+
+    def rate(self, name):
+        """Per second change of `name` between the last two samples (nan if unknown)"""
+        if self._size < 2:
+            return NAN
+        t0, t1 = self.timestamps(last=2)
+        return self.delta(name) / (t1 - t0) if t1 > t0 else NAN
+
+    def rates(self, name, last=None):
+        """Per second changes of `name` between consecutive samples, oldest first (len - 1 values)"""
+        times = self.timestamps(None if last is None else last + 1)
+        values = self.column(name, None if last is None else last + 1)
+        return [
+            (v1 - v0) / (t1 - t0) if t1 > t0 else NAN
+            for t0, t1, v0, v1 in zip(times, times[1:], values, values[1:])
+        ]
+
+    def downsample(self, seconds, agg='mean'):
+        """Aggregate samples into `seconds` wide buckets: [(bucket_start, {column: value})]
+
+        agg: mean | min | max | last
+        """
+        funcs = {
+            'mean': lambda vs: sum(vs) / len(vs),
+            'min': min,
+            'max': max,
+            'last': lambda vs: vs[-1],
+        }
+        func = funcs[agg]
+        positions = self._positions()
+        buckets = []
+        current, members = None, []
+        for i in positions + [None]:
+            start = None if i is None else self._times[i] - self._times[i] % seconds
+            if members and start != current:
+                row = {}
+                for c, data in zip(self.columns, self._data):
+                    vs = [data[k] for k in members if not math.isnan(data[k])]
+                    row[c] = func(vs) if vs else NAN
+                buckets.append((current, row))
+                members = []
+            current = start
+            if i is not None:
+                members.append(i)
+        return buckets
+
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def sparkline(values, width=None):
+    """Unicode sparkline of the last `width` values, nan shows as a blank"""
+    values = list(values)[-width:] if width else list(values)
+    finite = [v for v in values if not math.isnan(v)]
+    if not finite:
+        return ' ' * len(values)
+    low, high = min(finite), max(finite)
+    span = (high - low) or 1
+    top = len(SPARK_CHARS) - 1
+    return ''.join(' ' if math.isnan(v) else SPARK_CHARS[round((v - low) / span * top)] for v in values)
+
+
+def _format_value(v, precise=False):
+    if isinstance(v, float):
+        if math.isnan(v):
+            return 'nan' if precise else '-'
+        if v.is_integer():
+            return str(int(v))
+        return str(v) if precise else f'{v:.6g}'
+    return str(v)
+
+
+class Sink:
+    """Receives every sample of a Sampler, `row` maps column (and rate) names to numbers"""
+
+    def open(self, columns):
+        pass
+
+    def write(self, ts, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CsvSink(Sink):
+    """Append rows to a csv file kept open, header is written only when creating the file"""
+
+    def __init__(self, filename, time_format=None):
+        self.filename = filename
+        self.time_format = time_format
+        self._file = None
+
+    def _time(self, ts):
+        dt = datetime.fromtimestamp(ts)
+        return dt.strftime(self.time_format) if self.time_format else str(dt)
+
+    def open(self, columns):
+        new = not os.path.isfile(self.filename) or os.path.getsize(self.filename) == 0
+        self._file = open(self.filename, 'a')
+        self.columns = columns
+        if new:
+            self._file.write(','.join(['time'] + columns) + '\n')
+
+    def write(self, ts, row):
+        self._file.write(','.join([self._time(ts)] + [_format_value(row[c], precise=True) for c in self.columns]) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class NdjsonSink(Sink):
+    """One json object per sample, to a file or stdout"""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._file = None
+
+    def open(self, columns):
+        self._file = open(self.filename, 'a') if self.filename else sys.stdout
+
+    def write(self, ts, row):
+        record = {'time': ts, **{k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}}
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file and self.filename:
+            self._file.close()
+
+
+class PrometheusTextfileSink(Sink):
+    """Latest sample as gauges in a node_exporter textfile, replaced atomically on every write"""
+
+    def __init__(self, filename, prefix='corgi_', labels=None):
+        self.filename = filename
+        self.prefix = prefix
+        self.labels = ','.join(f'{k}="{v}"' for k, v in (labels or {}).items())
+
+    def _name(self, column):
+        return self.prefix + re.sub(r'[^a-zA-Z0-9_]', '_', column.replace('/s', '_per_second'))
+
+    def write(self, ts, row):
+        lines = []
+        for column, v in row.items():
+            if isinstance(v, float) and math.isnan(v):
+                continue
+            name = self._name(column)
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name}{{{self.labels}}} {v}' if self.labels else f'{name} {v}')
+        tmp = f'{self.filename}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.filename)
+
+
+class TerminalSink(Sink):
+    """Aligned table rows on stdout, header repeated every `header_every` rows"""
+
+    def __init__(self, header_every=20, time_format='%H:%M:%S', min_width=6):
+        self.header_every = header_every
+        self.time_format = time_format
+        self.min_width = min_width
+        self._count = 0
+
+    def open(self, columns):
+        self.columns = columns
+        self.widths = [max(len(c), self.min_width) for c in ['time'] + columns]
+
+    def _line(self, values):
+        cells = [str(v).ljust(w) for v, w in zip(values, self.widths)]
+        return '  '.join(cells).rstrip()
+
+    def write(self, ts, row):
+        values = [datetime.fromtimestamp(ts).strftime(self.time_format)] + [_format_value(row[c]) for c in self.columns]
+        self.widths = [max(w, len(v)) for w, v in zip(self.widths, values)]
+        lines = []
+        if self._count % self.header_every == 0:
+            lines.append(self._line(['time'] + self.columns))
+        lines.append(self._line(values))
+        echo('\n'.join(lines))
+        self._count += 1
+
+
+class Sampler:
+    """Call `collect` every `interval` seconds and feed the samples to a ring buffer and sinks
+
+    collect: callable returning {metric: number}, its first sample fixes the columns
+    counters: monotonically increasing metrics, sinks also get their per second
+              rate as '<name>/s'
+    Ticks are scheduled against a monotonic clock, so collection time doesn't
+    make the cadence drift; ticks missed by a slow collection are skipped.
+    """
+
+    def __init__(self, collect, interval=1.0, sinks=(), counters=(), capacity=CAPACITY):
+        self.collect = collect
+        self.interval = interval
+        self.sinks = list(sinks)
+        self.counters = list(counters)
+        self.capacity = capacity
+        self.buffer = None
+
+    def sample(self):
+        values = self.collect()
+        ts = time.time()
+        if self.buffer is None:
+            self.buffer = RingBuffer(values, self.capacity)
+            columns = self.buffer.columns + [f'{c}/s' for c in self.counters]
+            for sink in self.sinks:
+                sink.open(columns)
+        self.buffer.append(ts, values)
+        _, row = self.buffer.latest()
+        for c in self.counters:
+            row[f'{c}/s'] = self.buffer.rate(c)
+        for sink in self.sinks:
+            sink.write(ts, row)
+        return row
+
+    def run(self, count=None):
+        """Sample `count` times (forever by default)"""
+        start = time.monotonic()
+        tick = sampled = 0
+        try:
+            while True:
+                self.sample()
+                tick += 1
+                sampled += 1
+                if count is not None and sampled >= count:
+                    break
+                delay = start + tick * self.interval - time.monotonic()
+                if delay < 0:
+                    missed = math.ceil(-delay / self.interval)
+                    logger.debug(f"Sampling is {-delay:.3f}s behind, skipping {missed} tick(s)")
+                    tick += missed
+                    delay += missed * self.interval
+                time.sleep(delay)
+        finally:
+            for sink in self.sinks:
+                sink.close()
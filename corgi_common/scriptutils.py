@@ -1,8 +1,18 @@
-from . import run_script as _run_script, is_root, bye
+from . import run_script as _run_script, is_root, bye, popen, command_str, NoKeyboardInterrupt
+from .streamutils import StreamMultiplexer, FLUSH_INTERVAL
 from functools import partial
+from collections import namedtuple, deque
 import subprocess
+import logging
+import signal
+import os
+import time
 import click
 
+logger = logging.getLogger(__name__)
+
+ScriptResult = namedtuple('ScriptResult', ['rc', 'stdout', 'stderr', 'elapsed'])
+
 
 run_script = _run_script
 run_script_live = partial(_run_script, realtime=True, opts='e')
@@ -24,6 +34,121 @@ def run_script_as_root_live(script, dry=False):
         bye('The script needs to be run as root.')
     _run_script(script, realtime=True)
 
+class _ScriptJob:
+
+    def __init__(self, name, command, mux, opts='', timeout=None, live=False, fast_spawn=False):
+        self.name = name
+        self.command = command
+        self.mux = mux
+        self.out, self.err = [], []
+        self.start = time.monotonic()
+        self.deadline = None if timeout is None else self.start + timeout
+        try:
+            self.process = popen(
+                command,
+                opts=opts,
+                fast_spawn=fast_spawn and not live,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,     # own process group, so that a pipeline can be signalled as a whole
+            )
+        except OSError as e:    # program exec'ed directly is missing, bash would exit with 127
+            logger.critical(f"Subprocess Failed (127): [{command_str(command)}]: {e}")
+            self.process, self.open_streams = None, 0
+            self.err.append(str(e))
+            return
+        logger.debug(f"Running subprocess [{self.process.pid}]: [{command_str(command)}]")
+        self.open_streams = 2
+        prefix = f'[{name}] '
+        mux.register(self.process.stdout, on_line=self.out.append, on_eof=self._on_eof, prefix=prefix, echo=live)
+        mux.register(self.process.stderr, on_line=self.err.append, on_eof=self._on_eof, prefix=prefix, echo=live)
+
+    def _on_eof(self):
+        self.open_streams -= 1
+
+    def done(self):
+        return self.open_streams == 0 and (self.process is None or self.process.poll() is not None)
+
+    def signal(self, signum):
+        """Signal the whole process group (e.g. every command of a pipeline), not only bash"""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signum)
+            else:
+                self.process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+    def kill(self):
+        logger.error(f"Subprocess [{self.process.pid}] timed out: [{command_str(self.command)}]")
+        self.signal(signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+        # grandchildren may still hold the pipes open
+        self.mux.unregister(self.process.stdout)
+        self.mux.unregister(self.process.stderr)
+        self.process.wait()
+
+    def result(self):
+        if self.process is None:
+            return ScriptResult(127, '', '\n'.join(self.err), time.monotonic() - self.start)
+        self.process.stdout.close()
+        self.process.stderr.close()
+        rc = self.process.returncode
+        if rc:
+            logger.critical(f"Subprocess [{self.process.pid}] Failed ({rc}): [{command_str(self.command)}]")
+        return ScriptResult(rc, '\n'.join(self.out).rstrip(), '\n'.join(self.err).rstrip(), time.monotonic() - self.start)
+
+
+def run_scripts(commands, max_parallel=4, timeout=None, live=False, opts='', fast_spawn=False):
+    """Run bash scripts concurrently, at most `max_parallel` of them at a time
+
+    commands: list of scripts, or dict of {name: script}, a script can also be an argv list
+    timeout: per-script timeout (seconds), the script is killed once exceeded
+    live: echo output as it arrives, each line prefixed with [index] or [name]
+    fast_spawn: see run_script, for short polling probes
+
+    Return a list (or dict, following `commands`) of ScriptResult(rc, stdout, stderr, elapsed).
+    Unlike run_script, failures never raise, check `rc` of each result instead.
+    """
+    named = isinstance(commands, dict)
+    pending = deque(commands.items() if named else enumerate(commands))
+    running = {}
+    results = {}
+    mux = StreamMultiplexer()
+    try:
+        while pending or running:
+            while pending and len(running) < max_parallel:
+                name, command = pending.popleft()
+                running[name] = _ScriptJob(name, command, mux, opts=opts, timeout=timeout, live=live, fast_spawn=fast_spawn)
+            if len(mux):
+                mux.poll(FLUSH_INTERVAL)
+            else:               # only waiting for exit codes
+                time.sleep(0.01)
+            now = time.monotonic()
+            for name, job in list(running.items()):
+                if not job.done() and job.deadline is not None and now > job.deadline:
+                    job.kill()
+                if job.done():
+                    results[name] = job.result()
+                    del running[name]
+    except KeyboardInterrupt:
+        logger.info("Sending SIGINT to subprocesses ..")
+        jobs = [job for job in running.values() if job.process is not None]
+        for job in jobs:
+            job.signal(signal.SIGINT)
+        logger.info("Waiting subprocesses to exit gracefully..")
+        with NoKeyboardInterrupt():
+            for job in jobs:
+                job.process.wait()
+        raise
+    finally:
+        mux.close()
+    if named:
+        return {name: results[name] for name in commands}
+    return [results[i] for i in range(len(commands))]
+
+
+run_scripts_live = partial(run_scripts, live=True)
+
 def write_to_clipboard(output):
     process = subprocess.Popen('pbcopy', env={'LANG': 'en_US.UTF-8'}, stdin=subprocess.PIPE)
     process.communicate(output.encode())
@@ -0,0 +1,168 @@
+import os
+import time
+import codecs
+import logging
+import selectors
+from click import echo
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.1            # seconds
+
+
+class LineSplitter:
+    """Split byte chunks into decoded lines incrementally (line endings stripped)"""
+
+    def __init__(self, encoding='utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._pending = ''
+
+    def feed(self, chunk):
+        text = self._pending + self._decoder.decode(chunk)
+        if '\n' not in text:
+            self._pending = text
+            return []
+        lines = text.split('\n')
+        self._pending = lines.pop()
+        return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+    def close(self):
+        text = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        return [text.rstrip('\r')] if text else []
+
+
+class BatchedWriter:
+    """Buffer lines for the terminal, flushing at most every `interval` seconds"""
+
+    def __init__(self, err=False, interval=FLUSH_INTERVAL, max_buffered=CHUNK_SIZE):
+        self.err = err
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self._buf = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def write_line(self, line):
+        self._buf.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.max_buffered:
+            self.flush()
+
+    def maybe_flush(self):
+        if self._buf and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buf:
+            return
+        text = '\n'.join(self._buf)
+        self._buf = []
+        self._size = 0
+        echo(text, err=self.err)
+
+
+class _Channel:
+
+    def __init__(self, stream, on_line, on_eof, prefix, echo, encoding):
+        self.stream = stream
+        self.on_line = on_line
+        self.on_eof = on_eof
+        self.prefix = prefix
+        self.echo = echo
+        self.splitter = LineSplitter(encoding)
+
+
+class StreamMultiplexer:
+    """Read many child process pipes on one thread
+
+    > mux = StreamMultiplexer()
+    > mux.register(p1.stdout, prefix='[p1] ')
+    > mux.register(p2.stdout, on_line=lines.append, echo=False)
+    > mux.run()
+
+    Pipes are read in large chunks as soon as the selector reports them ready,
+    lines are dispatched to `on_line` and echoed lines are written to the
+    terminal in batches.
+    """
+
+    def __init__(self, writer=None, chunk_size=CHUNK_SIZE):
+        self.writer = writer or BatchedWriter()
+        self.chunk_size = chunk_size
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, stream, on_line=None, on_eof=None, prefix='', echo=True, encoding='utf-8'):
+        channel = _Channel(stream, on_line, on_eof, prefix, echo, encoding)
+        self._selector.register(stream.fileno(), selectors.EVENT_READ, channel)
+        return channel
+
+    def unregister(self, stream):
+        """Stop reading `stream` (flushing its partial line) and close it"""
+        try:
+            key = self._selector.get_key(stream.fileno())
+        except (KeyError, ValueError):
+            return
+        self._eof(key.fd, key.data)
+        stream.close()
+
+    def __len__(self):
+        return len(self._selector.get_map())
+
+    def _dispatch(self, channel, lines):
+        for line in lines:
+            if channel.on_line:
+                channel.on_line(line)
+            if channel.echo:
+                self.writer.write_line(channel.prefix + line)
+
+    def _eof(self, fd, channel):
+        self._selector.unregister(fd)
+        self._dispatch(channel, channel.splitter.close())
+        logger.info(f"Stream EOF (fd: {fd})")
+        if channel.on_eof:
+            channel.on_eof()
+
+    def poll(self, timeout=None):
+        """Process one round of ready streams, return False when nothing is registered"""
+        if not len(self):
+            return False
+        for key, _ in self._selector.select(timeout):
+            channel = key.data
+            try:
+                chunk = os.read(key.fd, self.chunk_size)
+            except OSError as e:
+                logger.error(f"Failed to read fd {key.fd}: {e}")
+                chunk = b''
+            if chunk:
+                self._dispatch(channel, channel.splitter.feed(chunk))
+            else:
+                self._eof(key.fd, channel)
+        self.writer.maybe_flush()
+        return len(self) > 0
+
+    def run(self, timeout=None, tick=FLUSH_INTERVAL):
+        """Pump all streams until every one hits EOF or `timeout` seconds elapse"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while len(self):
+                wait = tick
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return False
+                self.poll(wait)
+            return True
+        finally:
+            self.writer.flush()
+
+    def close(self):
+        for key in list(self._selector.get_map().values()):
+            self._selector.unregister(key.fd)
+            try:
+                key.data.stream.close()
+            except Exception:
+                pass
+        self._selector.close()
+        self.writer.flush()
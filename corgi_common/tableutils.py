@@ -0,0 +1,176 @@
+import re
+import io
+import csv
+import json
+from itertools import islice, chain
+from .streamutils import BatchedWriter
+from .dsutils import compile_path
+
+MISSING_VALUE = '[none]'
+SAMPLE_SIZE = 200
+
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+
+
+def _visible_len(s):
+    return len(_ANSI.sub('', s)) if '\x1b' in s else len(s)
+
+
+def _columns(mappings, missing_value):
+    """Normalize hprint style mappings: {header: key | (key, func) | (key, default, func)}"""
+    columns = []
+    for header, spec in mappings.items():
+        if isinstance(spec, (tuple, list)):
+            if len(spec) == 2:
+                (key, func), default = spec, missing_value
+            elif len(spec) == 3:
+                key, default, func = spec
+            else:
+                raise ValueError(f"Invalid mapping {spec}")
+        else:
+            key, default, func = spec, missing_value, None
+        columns.append((header, key, default, func))
+    return columns
+
+
+def _row(item, columns):
+    row = []
+    for _header, key, default, func in columns:
+        value = compile_path(key)(item) if key else item
+        if value is None:
+            value = default
+        row.append(func(value) if func and value is not None else value)
+    return row
+
+
+class _TableFormatter:
+    machine_readable = False
+
+    def __init__(self, headers, sample, header=True):
+        self.widths = [_visible_len(h) for h in headers]
+        for row in sample:
+            for i, v in enumerate(row):
+                self.widths[i] = max(self.widths[i], _visible_len(str(v)))
+        self.headers = headers
+        self.header = header
+
+    def _line(self, values):
+        cells = [s + ' ' * (w - _visible_len(s)) for s, w in zip(map(str, values), self.widths)]
+        return '  '.join(cells).rstrip()
+
+    def start(self):
+        if not self.header:
+            return []
+        return [self._line(self.headers), '  '.join('-' * w for w in self.widths)]
+
+    def format(self, idx, row):
+        return [self._line(row)]
+
+
+class _XFormatter:
+    machine_readable = False
+
+    def __init__(self, headers, sample, header=True):
+        self.left = max(max(len(h) for h in headers), len('-[ RECORD 999999 ]-')) + 1
+        self.right = max([_visible_len(str(v)) for row in sample for v in row] + [1]) + 1
+        self.headers = headers
+        self.header = header
+
+    def start(self):
+        return []
+
+    def format(self, idx, row):
+        lines = [f'-[ RECORD {idx} ]'.ljust(self.left, '-') + '+' + '-' * self.right] if self.header else []
+        return lines + [h.ljust(self.left) + '| ' + str(v) for h, v in zip(self.headers, row)]
+
+
+class _NdjsonFormatter:
+    machine_readable = True     # missing values stay None (null)
+
+    def __init__(self, headers, sample, header=True):
+        self.headers = headers
+
+    def start(self):
+        return []
+
+    def format(self, idx, row):
+        return [json.dumps(dict(zip(self.headers, row)), default=str, ensure_ascii=False)]
+
+
+class _CsvFormatter:
+    machine_readable = True     # missing values stay None (empty field)
+
+    def __init__(self, headers, sample, header=True):
+        self.headers = headers
+        self.header = header
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator='')
+
+    def _line(self, values):
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._writer.writerow(values)
+        return self._buf.getvalue()
+
+    def start(self):
+        return [self._line(self.headers)] if self.header else []
+
+    def format(self, idx, row):
+        return [self._line(row)]
+
+
+FORMATTERS = {
+    'table': _TableFormatter,
+    'x': _XFormatter,
+    'ndjson': _NdjsonFormatter,
+    'csv': _CsvFormatter,
+}
+
+
+def stream_print(
+        data, mappings=None, fmt='table', sample_size=SAMPLE_SIZE,
+        header=True, numbered=False, offset=0, missing_value=MISSING_VALUE, err=False,
+):
+    """Print records from an iterable without materializing it
+
+    Takes the same `mappings` as pretty_print. Column widths (table/x format)
+    are computed from the first `sample_size` rows only, later wider values
+    are not truncated, they just break the alignment.
+    fmt: table | x | ndjson | csv
+    missing_value replaces None in table/x output only, ndjson/csv keep null/empty fields.
+    Return the number of printed records.
+    """
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Invalid format {fmt} (choices: {', '.join(FORMATTERS)})")
+    it = iter(data)
+    head = list(islice(it, sample_size))
+    if not head:
+        return 0
+    if not mappings:
+        mappings = {k: k for k in head[0]}
+    columns = _columns(mappings, None if FORMATTERS[fmt].machine_readable else missing_value)
+    headers = [c[0] for c in columns]
+    if numbered:
+        headers = ['No'] + headers
+
+    def _rows():
+        for idx, item in enumerate(chain(head, it), 1 + offset):
+            row = _row(item, columns)
+            yield idx, [idx] + row if numbered else row
+
+    rows = _rows()
+    sample = [next(rows) for _ in range(len(head))]
+    formatter = FORMATTERS[fmt](headers, [row for _, row in sample], header=header)
+    writer = BatchedWriter(err=err)
+    count = 0
+    try:
+        for line in formatter.start():
+            writer.write_line(line)
+        for idx, row in chain(sample, rows):
+            for line in formatter.format(idx, row):
+                writer.write_line(line)
+            writer.maybe_flush()
+            count += 1
+    finally:
+        writer.flush()
+    return count
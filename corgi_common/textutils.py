@@ -1,10 +1,103 @@
 import re
+from functools import lru_cache
+
+_registry = {}
+
+
+def register(name, regex, flags=0):
+    """Compile `regex` once and make it available by `name` to extract/extract_mp/Scanner"""
+    _registry[name] = compiled = re.compile(regex, flags)
+    return compiled
+
+
+@lru_cache(maxsize=512)
+def _compile(regex):
+    return re.compile(regex)
+
+
+def pattern(regex):
+    """Compiled pattern for a registered name, a pattern string or an already compiled pattern"""
+    if isinstance(regex, re.Pattern):
+        return regex
+    compiled = _registry.get(regex)
+    return compiled if compiled is not None else _compile(regex)
+
 
 def extract(regex, string):
-    m = re.match(regex, string)
+    m = pattern(regex).match(string)
     if m:
         return m.groups()
 
 # multiline
 def extract_mp(regex, para):
-    return re.findall(regex, para)
+    return pattern(regex).findall(para)
+
+
+def iter_extract(regex, lines):
+    """Streaming extract: groups of every matching line of a file object/iterable"""
+    p = pattern(regex)
+    for line in lines:
+        m = p.match(line)
+        if m:
+            yield m.groups()
+
+
+class Scanner:
+    """Extract several fields from a text in a single sweep
+
+    > scanner = Scanner({'duration': r'Capture duration:\\s*(.*) seconds', 'rate': r'Data byte rate:\\s*(.*) (kBps|bytes/s)'})
+    > scanner.scan(text)
+    > {'duration': '12', 'rate': ('1.5', 'kBps')}
+
+    Fields are combined into one alternation, so patterns may not use
+    backreferences, named groups or global inline flags (pass `flags` instead).
+    A field value is the whole match (no group), the group (one group) or the
+    tuple of groups, like re.findall. Missing fields are None.
+    """
+
+    def __init__(self, fields, flags=re.MULTILINE):
+        self.names = list(fields)
+        parts = []
+        self._slices = {}
+        index = 1
+        for i, name in enumerate(self.names):
+            regex = fields[name]
+            n = re.compile(regex, flags).groups
+            parts.append(f'(?P<_f{i}>{regex})')
+            self._slices[f'_f{i}'] = (name, index, n)
+            index += n + 1
+        self.regex = re.compile('|'.join(parts), flags)
+
+    def _value(self, m):
+        name, index, n = self._slices[m.lastgroup]
+        if n == 0:
+            return name, m.group(index)
+        if n == 1:
+            return name, m.group(index + 1)
+        return name, m.groups()[index:index + n]
+
+    def _collect(self, matches, find_all, result):
+        for m in matches:
+            name, value = self._value(m)
+            if find_all:
+                result[name].append(value)
+            elif result[name] is None:
+                result[name] = value
+                if all(v is not None for v in result.values()):
+                    return True
+        return False
+
+    def scan(self, text, find_all=False):
+        """{field: first value} (or {field: [all values]} with find_all)"""
+        result = {name: [] if find_all else None for name in self.names}
+        self._collect(self.regex.finditer(text), find_all, result)
+        return result
+
+    def scan_lines(self, lines, find_all=False):
+        """Like scan, over a file object/iterable of lines (patterns can't span lines),
+        stops reading once every field is found unless find_all"""
+        result = {name: [] if find_all else None for name in self.names}
+        for line in lines:
+            if self._collect(self.regex.finditer(line), find_all, result):
+                break
+        return result
@@ -1,19 +1,185 @@
+import sys
+import json
+import time
+import atexit
+import signal
 import logging
+import threading
 from functools import wraps
+from contextlib import contextmanager, nullcontext
 import click
 from stopwatch import Stopwatch
 
 logger = logging.getLogger(__name__)
 
+SUB_BUCKET_BITS = 7             # 128 sub-buckets per power of 2, <1% relative error
+TIMING_FORMATS = ('table', 'json', 'prometheus')
+
+
+class LatencyHistogram:
+    """HDR style log-linear histogram of durations, recorded in nanoseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._buckets = {}
+
+    def record(self, nsec):
+        nsec = int(nsec)
+        shift = nsec.bit_length() - SUB_BUCKET_BITS
+        bucket = nsec if shift <= 0 else (nsec >> shift) << shift
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += nsec
+        if self.min is None or nsec < self.min:
+            self.min = nsec
+        if nsec > self.max:
+            self.max = nsec
+
+    def copy(self):
+        other = LatencyHistogram()
+        other.count, other.total, other.min, other.max = self.count, self.total, self.min, self.max
+        other._buckets = dict(self._buckets)
+        return other
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = max(1, round(p / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= target:
+                return min(bucket, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min or 0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class TimingRegistry:
+    """Process-wide latency histograms by name, recording is a no-op until enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self, fmt='table', at_exit=True, signum=getattr(signal, 'SIGUSR1', None)):
+        """Start recording, dump in `fmt` at exit and whenever `signum` is received"""
+        if fmt not in TIMING_FORMATS:
+            raise ValueError(f"Invalid timing format {fmt} (choices: {', '.join(TIMING_FORMATS)})")
+        self.enabled = True
+        if at_exit:
+            atexit.register(self.dump, fmt)
+        if signum is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signum, lambda sig, frame: self._dump_in_background(fmt))
+
+    def _dump_in_background(self, fmt):
+        # the handler may interrupt record() holding the lock, so never dump from the handler itself
+        threading.Thread(target=self.dump, args=(fmt,), name='timing-dump', daemon=True).start()
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.record(seconds * 1e9)
+
+    @contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timer(self, name):
+        """Context manager timing its block under `name`"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timer(name)
+
+    def timed(self, name=None):
+        """Decorator timing every call, named after the function by default"""
+        def decorator(f):
+            key = name or f'{f.__module__}.{f.__qualname__}'
+
+            @wraps(f)
+            def wrap(*args, **kw):
+                if not self.enabled:
+                    return f(*args, **kw)
+                start = time.perf_counter()
+                try:
+                    return f(*args, **kw)
+                finally:
+                    self.record(key, time.perf_counter() - start)
+            return wrap
+        return decorator
+
+    def snapshot(self):
+        with self._lock:
+            histograms = [(name, h.copy()) for name, h in sorted(self._histograms.items())]
+        return [{'name': name, **h.summary()} for name, h in histograms]
+
+    def render(self, fmt='table'):
+        rows = self.snapshot()
+        if fmt == 'json':
+            return json.dumps(rows, indent=2)
+        if fmt == 'prometheus':
+            lines = ['# HELP corgi_latency_seconds Latency of instrumented code', '# TYPE corgi_latency_seconds summary']
+            for row in rows:
+                label = row['name'].replace('\\', '\\\\').replace('"', '\\"')
+                for q in ('p50', 'p90', 'p99'):
+                    lines.append(f'corgi_latency_seconds{{name="{label}",quantile="0.{q[1:]}"}} {row[q] / 1e9}')
+                lines.append(f'corgi_latency_seconds_sum{{name="{label}"}} {row["total"] / 1e9}')
+                lines.append(f'corgi_latency_seconds_count{{name="{label}"}} {row["count"]}')
+            return '\n'.join(lines)
+        if not rows:
+            return '(no timing recorded)'
+        from hprint import pretty_print
+        ms = lambda ns: f'{ns / 1e6:.3f}'  # noqa: E731
+        return pretty_print(sorted(rows, key=lambda r: r['total'], reverse=True), mappings={
+            'Name': 'name',
+            'Count': 'count',
+            'Total(ms)': ('total', ms),
+            'p50(ms)': ('p50', ms),
+            'p90(ms)': ('p90', ms),
+            'p99(ms)': ('p99', ms),
+            'Max(ms)': ('max', ms),
+        }, raw=True)
+
+    def dump(self, fmt='table', file=None):
+        click.echo(self.render(fmt), file=file or sys.stderr)
+
+
+registry = TimingRegistry()
+timed = registry.timed
+timer = registry.timer
+
+
 def simple_timing(f):
     @wraps(f)
     def wrap(*args, **kw):
         stopwatch = Stopwatch(2)
         result = f(*args, **kw)
         click.echo(f'Time: {stopwatch}', err=True)
+        if registry.enabled:
+            registry.record(f'{f.__module__}.{f.__qualname__}', stopwatch.duration)
         return result
     return wrap
 
+
 # annotation
 def debug_timing(f):
     @wraps(f)
@@ -22,6 +188,8 @@ def debug_timing(f):
         stopwatch = Stopwatch(2)
         result = f(*args, **kw)
         # te = time.time()
+        if registry.enabled:
+            registry.record(f'{f.__module__}.{f.__qualname__}', stopwatch.duration)
         if logger.isEnabledFor(logging.DEBUG):
             # click.echo(f'⏱ {stopwatch} |> [fn:]{f.__module__}.{f.__name__} | [args:] {args!r} | [kw:] {kw!r}', err=True)
             args = [repr(arg) for arg in args]
@@ -4,7 +4,8 @@ import os
 import json
 from string import Template
 import tempfile
-from jinja2 import FileSystemLoader, Environment
+from functools import lru_cache
+from corgi_common.jinja2utils import render
 
 DEFAULT_K8S_VERSION = '1.30'
 
@@ -13,17 +14,20 @@ def _run_as_root(*args, **kwargs):
     run_script(*args, **kwargs)
 
 
-def _get_script(name, values={}):
+@lru_cache(maxsize=None)
+def _load_template(name):
     filepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'sh', name)
     with open(filepath, 'r') as f:
-        return Template(f.read()).safe_substitute(values)
+        return Template(f.read())
+
+
+def _get_script(name, values={}):
+    return _load_template(name).safe_substitute(values)
 
 
 def _get_script_v2(template_filename, **values):
     templates_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'templates')
-    env = Environment(loader=FileSystemLoader(templates_path), autoescape=True)
-    tmpl = env.get_template(template_filename)
-    return tmpl.render(**values)
+    return render(templates_path, template_filename, **values)
 
 
 def _run(script, dry=False):
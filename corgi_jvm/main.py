@@ -1,15 +1,17 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
+import re
 import click
 from os.path import isfile, join
 import sys
-from corgi_common import config_logging, pretty_print, bye, as_root, is_root, goodbye
+from corgi_common import config_logging, pretty_print, bye, as_root, is_root, goodbye, command_str
 from corgi_common.dateutils import YmdHMS
-from corgi_common.scriptutils import run_script
-from corgi_common.textutils import extract
+from corgi_common.scriptutils import run_script, run_scripts
+from corgi_common.textutils import extract, extract_mp, register, Scanner
+from corgi_common.timeutils import timed, registry as timing_registry
+from corgi_common.samplingutils import Sampler, CsvSink, TerminalSink, PrometheusTextfileSink
+from corgi_common.columnarutils import ColumnarSink
 import logging
-import time
-from datetime import datetime
 import psutil
 import tempfile
 import OpenSSL.crypto as crypto
@@ -84,18 +86,8 @@ def _numeric(text):
     except Exception:
         return 'nan'
 
-def _gcutil_metric(pid):
+def _jstat_metric(output):
     """https://github.com/frohoff/jdk8u-dev-jdk/blob/master/src/share/classes/sun/tools/jstat/resources/jstat_options"""
-    output = _run_script(f"jstat -gcutil {pid}")
-    lines = output.splitlines()
-    headers = lines[0].split()
-    values = [_numeric(v) for v in lines[1].split()]
-    d = dict(zip(headers, values))
-    logger.info(d)
-    return d
-
-def _jit_metric(pid):
-    output = _run_script(f"jstat -compiler {pid}")
     lines = output.splitlines()
     headers = lines[0].split()
     values = [_numeric(v) for v in lines[1].split()]
@@ -106,21 +98,46 @@ def _jit_metric(pid):
 def _round(n, d=1):
     return round(n + 1e-9, d)
 
+
+register('jvm.perf.threads', r'^java\.threads\.(live|livePeak)=([0-9]+)$', re.MULTILINE)
+register('jvm.heap.used', r'^.*heap.*?used ([^ ]*)', re.MULTILINE)
+register('jvm.flags.max_heap', r'MaxHeapSize=([^ ]*)')
+
+_NMT_SCANNER = Scanner({
+    'total_committed': r'^Total:.*committed=([0-9]*)$',
+    'other_committed': r'Other.*?committed=([0-9]*)',
+})
+
+@timed()
 def _fetch_metric(pid, proc, with_jit=False):
     global max_heap
     # thread_count = int(_run_script(f'jcmd {pid} Thread.print -l -e | grep "java.lang.Thread.State" | wc -l'))
 
-    thread_count = int(_run_script(f'jcmd {pid} PerfCounter.print | grep java.threads.live=').split('=')[1])
-    thread_count_peak = int(_run_script(f'jcmd {pid} PerfCounter.print | grep java.threads.livePeak=').split('=')[1])
-    used_heap = _to_bytes(_run_script(f"jcmd {pid} GC.heap_info | grep heap | grep -o 'used [^ ]*'").split()[1])
-    max_heap = max_heap or _to_bytes(_run_script(f"jinfo -flags {pid} | grep -o 'MaxHeapSize=[^ ]*'").split('=')[1])
+    # all probes of one tick are spawned concurrently, as argv (no bash, no grep pipelines)
+    scripts = {
+        'threads': ['jcmd', str(pid), 'PerfCounter.print'],
+        'heap': ['jcmd', str(pid), 'GC.heap_info'],
+        'rss': ['ps', '-o', 'rss=', '-p', str(pid)],
+        'gcutil': ['jstat', '-gcutil', str(pid)],
+    }
+    if not max_heap:
+        scripts['max_heap'] = ['jinfo', '-flags', str(pid)]
+    if native_mem_track:
+        scripts['nmt'] = ['jcmd', str(pid), 'VM.native_memory', 'summary', 'scale=B']
+    if with_jit:
+        scripts['jit'] = ['jstat', '-compiler', str(pid)]
+    outputs = _run_scripts(scripts)
+
+    perf_counters = dict(extract_mp('jvm.perf.threads', outputs['threads']))
+    thread_count = int(perf_counters['live'])
+    thread_count_peak = int(perf_counters['livePeak'])
+    used_heap = _to_bytes(extract_mp('jvm.heap.used', outputs['heap'])[0])
+    max_heap = max_heap or _to_bytes(extract_mp('jvm.flags.max_heap', outputs['max_heap'])[0])
 
-    rss = int(_run_script(f"ps -o rss -p {pid} | tail -1")) * 1024
-    gcutil = _gcutil_metric(pid)
+    rss = int(outputs['rss']) * 1024
+    gcutil = _jstat_metric(outputs['gcutil'])
 
     result = {
-        'time': datetime.now(),
-
         'cpu': proc.cpu_percent(),
 
         'th': thread_count,
@@ -144,13 +161,13 @@ def _fetch_metric(pid, proc, with_jit=False):
         'rss': _round(rss / 1024 / 1024),
     }
     if native_mem_track:
-        native_mem_info = _run_script(f"jcmd {pid} VM.native_memory summary scale=B")
-        total_committed = int(_run_script(f"jcmd {pid} VM.native_memory summary scale=B | grep 'Total:' | grep -o 'committed=[0-9]*$'").split('=')[1])
+        nmt = _NMT_SCANNER.scan(outputs['nmt'])
+        total_committed = int(nmt['total_committed'])
         result['commit'] = _round(total_committed / 1024 / 1024)
         result['r/c'] = _round(rss / total_committed, 3)  # measure malloc effeciency
-        result['native'] = _round(int(_run_script(f"echo '{native_mem_info}' | grep Other | grep -o 'committed=[0-9]*'").split('=')[1]) / 1024 / 1024)
+        result['native'] = _round(int(nmt['other_committed']) / 1024 / 1024)
     if with_jit:
-        jit = _jit_metric(pid)
+        jit = _jstat_metric(outputs['jit'])
         result['jc'] = jit['Compiled']
         result['jf'] = jit['Failed']
         result['jt'] = jit['Time']
@@ -161,37 +178,19 @@ def _fetch_metric(pid, proc, with_jit=False):
 @click.argument('pid', type=int, required=True)
 @click.option('--interval', '-i', default=3, type=int, show_default=True)
 @click.option('--with-jit', is_flag=True, show_default=True)
-def monitor(pid, interval, with_jit):
+@click.option('--prometheus-textfile', help='Also expose latest metrics in this node_exporter textfile')
+@click.option('--columnar', 'columnar_path', help='Also append samples to this columnar dataset (directory)')
+def monitor(pid, interval, with_jit, prometheus_textfile, columnar_path):
     global native_mem_track
     native_mem_track = _is_native_memory_track_enabled(pid)
     logger.info(f"NativeMemoryTracking enabled: {native_mem_track}")
-    csv_filename = f'jvm_{pid}.csv'
     proc = psutil.Process(pid)
-    h_keys = _fetch_metric(pid, proc).keys()
-    if not isfile(csv_filename):
-        with open(csv_filename, 'w') as f:
-            headers = ",".join(h_keys)
-            logger.info(headers)
-            f.write(headers + '\n')
-    count = 0
-
-    while True:
-        metrics = _fetch_metric(pid, proc, with_jit)
-        m_values = metrics.values()
-        m_str_values = [str(v) for v in m_values]
-        metrics_str = ','.join(m_str_values)
-        with open(csv_filename, 'a') as f:
-            f.write(metrics_str + '\n')
-            logger.info(metrics_str)
-        metrics['time'] = metrics['time'].strftime('%H:%M:%S')
-        output = pretty_print([metrics], json_format=False, tf='plain', raw=True)
-        if count % 5 == 0:
-            print(output)
-        else:
-            print(output.splitlines()[1])
-        time.sleep(interval - 1)
-        count += 1
-    pass
+    sinks = [CsvSink(f'jvm_{pid}.csv'), TerminalSink(header_every=5)]
+    if prometheus_textfile:
+        sinks.append(PrometheusTextfileSink(prometheus_textfile, prefix='corgi_jvm_', labels={'pid': pid}))
+    if columnar_path:
+        sinks.append(ColumnarSink(columnar_path))
+    Sampler(lambda: _fetch_metric(pid, proc, with_jit), interval=interval, sinks=sinks).run()
 
 
 @cli.command(help='Print class histogram', name='GC.class_histogram')
@@ -219,6 +218,20 @@ def _run_script(cmd):
         logger.info(f"{cmd}\n{out}")
         return out
 
+def _run_scripts(cmds):
+    results = run_scripts(cmds, max_parallel=len(cmds), fast_spawn=True)   # monitor probes, every tick
+    outputs = {}
+    for name, cmd in cmds.items():
+        rc, o, e, elapsed = results[name]
+        if timing_registry.enabled:
+            timing_registry.record(f'corgi_jvm.script.{name}', elapsed)
+        if rc != 0:
+            bye(e)
+        out = o.strip()
+        logger.info(f"{command_str(cmd)} ({elapsed:.3f}s)\n{out}")
+        outputs[name] = out
+    return outputs
+
 def _string_table(pid, jcmd):
     o = _run_script(f"{jcmd} {pid} VM.stringtable")
     print(o)
@@ -334,6 +347,10 @@ def native_memory_parse(input_file):
         _parse_native_mem(txt)
     pass
 
+
+register('jvm.nmt.category', r'^-\s*(.*) \(reserved=([0-9]*).*, committed=([0-9]*).*\)$')
+register('jvm.nmt.total', r'^Total: reserved=([0-9]*)(.*), committed=([0-9]*).*$')
+
 def _parse_native_mem(txt, rss=None, u='KB'):
     logger.info(f"Native Memory info: \n{txt}")
     total_reserved = None
@@ -342,7 +359,7 @@ def _parse_native_mem(txt, rss=None, u='KB'):
     unit = None
     for line in txt.splitlines():
         if line.startswith('-'):
-            groups = extract(r'^-\s*(.*) \(reserved=([0-9]*).*, committed=([0-9]*).*\)$', line)
+            groups = extract('jvm.nmt.category', line)
             if groups:
                 name, r, c = groups
                 result.append({
@@ -352,7 +369,7 @@ def _parse_native_mem(txt, rss=None, u='KB'):
                 })
         elif line.startswith('Total'):
             # groups = extract(r'^Total: reserved=([0-9]*)([GMKB]?), committed=([0-9]*).*$', line)
-            groups = extract(r'^Total: reserved=([0-9]*)(.*), committed=([0-9]*).*$', line)
+            groups = extract('jvm.nmt.total', line)
             # print(groups)
             if groups:
                 total_reserved, unit, total_committed = groups
@@ -9,6 +9,7 @@ from icecream import ic
 from typing import Optional, Dict
 import codecs
 from datetime import datetime, timedelta
+from corgi_common.profileutils import start_profiling_from_argv
 from qqutils import run_proxy, as_root, run_script, YmdHMS, configure_logging, from_cwd, is_port_in_use, submit_thread, hprint, prompt, add_suffix, pinfo, get_param, modify_extension, perror, switch_dir, red, green, time_measurer
 from tempfile import NamedTemporaryFile
 import os
@@ -757,4 +758,5 @@ def dictation(ctx, filename, model):
 
 
 def main():
+    start_profiling_from_argv('corgi_misc')
     cli()
@@ -3,8 +3,11 @@
 import click
 import time
 import json
+from datetime import timezone
 from corgi_common import config_logging, pretty_print, get, bye
 from corgi_common.dateutils import pretty_duration
+from corgi_common.timeutils import timed, timer
+from corgi_common.columnarutils import ColumnarWriter
 import logging
 import pymongo
 
@@ -54,6 +57,20 @@ def _compress0(doc, length=100):
         return 'n/a'
     return str(doc).replace(' ', '')[:length]
 
+def _profile_row(doc):
+    return {
+        'time': doc['ts'].replace(tzinfo=timezone.utc).timestamp(),  # pymongo returns naive UTC datetimes
+        'op': doc.get('op'),
+        'ns': doc.get('ns'),
+        'app': doc.get('appName'),
+        'millis': doc.get('millis', 0),
+        'docsExamined': doc.get('docsExamined', 0),
+        'keysExamined': doc.get('keysExamined', 0),
+        'nreturned': doc.get('nreturned', 0),
+        'responseLength': doc.get('responseLength', 0),
+    }
+
+@timed()
 def _print_profiles(docs, brief=False, offset=0):
     if not brief:
         for idx, doc in enumerate(docs, 1 + offset):
@@ -253,7 +270,8 @@ def basic_info(host, port, username, password):
 @click.option('--collection', '-c', help='Filter by collection')
 @click.option('--brief', '-b', is_flag=True)
 @click.option('--slowms', type=int)
-def profile(host, port, dbname, op, brief, app, collection, slowms):
+@click.option('--columnar', 'columnar_path', help='Also append profiled operations to this columnar dataset (directory)')
+def profile(host, port, dbname, op, brief, app, collection, slowms, columnar_path):
     limit = 64
     fetched_ts = set()
 
@@ -285,23 +303,29 @@ def profile(host, port, dbname, op, brief, app, collection, slowms):
         logger.info(f"Set profile level to 2 with filter: {_filter}")
         db.command("profile", 2, filter=_filter)
     offset = 0
+    writer = ColumnarWriter(columnar_path, row_group_size=256) if columnar_path else None
     try:
         while True:
             try:
-                docs = system.profile.find(_filter).limit(limit).sort('ts', -1)
                 new_docs = []
-                for doc in docs:
-                    ts = doc['ts']
-                    if ts not in fetched_ts:
-                        fetched_ts.add(ts)
-                        new_docs += [doc]
+                with timer('corgi_mongo.profile.fetch'):
+                    for doc in system.profile.find(_filter).limit(limit).sort('ts', -1):
+                        ts = doc['ts']
+                        if ts not in fetched_ts:
+                            fetched_ts.add(ts)
+                            new_docs += [doc]
                 if new_docs:
+                    if writer:
+                        for doc in new_docs:
+                            writer.write(_profile_row(doc))
                     _print_profiles(new_docs, brief, offset=offset)
                     offset += len(new_docs)
                 time.sleep(1)
             except Exception as e:
                 warning(str(e))
     finally:
+        if writer:
+            writer.close()
         logger.info("Set profile level back to 0")
         db.command("profile", 0)
     pass
@@ -4,12 +4,8 @@ import click
 import time
 from corgi_common.loggingutils import config_logging
 from corgi_common.scriptutils import pause
-from .tutorial import tutorial
-from .recipes import recipes
-from .demo import demo
-from .index import index
-from .internals import internals
-from .pg_common import execute as e, pg_cursor, psql, get_show_result, get_share_conn, reload_conf, create_connection
+from corgi_common.clickutils import LazyGroup
+from .pg_common import stream_execute, execute as e, pg_cursor, psql, get_show_result, get_share_conn, reload_conf, create_connection
 import logging
 import sys
 from corgi_common.timeutils import simple_timing
@@ -26,7 +22,13 @@ from psycopg2.extensions import (
 
 logger = logging.getLogger(__name__)
 
-@click.group(help="CLI tool for Postgres")
+@click.group(cls=LazyGroup, lazy_subcommands={
+    'tutorial': 'corgi_pg.tutorial.tutorial',
+    'recipes': 'corgi_pg.recipes.recipes',
+    'index': 'corgi_pg.index.index',
+    'internals': 'corgi_pg.internals.internals',
+    'demo': 'corgi_pg.demo.demo',
+}, help="CLI tool for Postgres")
 @click.pass_context
 @click.option('--hostname', envvar='PGHOST', show_default=True, required=True)
 @click.option('--port', envvar='PGPORT', default=5672, type=int)
@@ -433,12 +435,15 @@ ANALYZE;
 @cli.command(short_help="execute SQL ad-hoc", name='execute')
 @click.pass_context
 @click.argument('statement', required=False)
-def run(ctx, statement):
+@click.option('--stream', is_flag=True, help='Print rows while fetching them with a server-side cursor (queries only)')
+def run(ctx, statement, stream):
     # execute(ctx, "select version();")
     # execute(ctx, "SELECT first_name FROM customer;")
     # execute(ctx, "SELECT * FROM customer;")
     # execute(ctx, "SELECT * FROM rental LIMIT 5;")
-    if statement:
+    if stream:
+        stream_execute(ctx, statement)
+    elif statement:
         e(ctx, statement)
     else:
         e(ctx)
@@ -474,9 +479,10 @@ def _recursive_help(cmd, parent=None, indent=0, include_hidden=False):
     ctx = click.core.Context(cmd, info_name=cmd.name, parent=parent)
     if (not cmd.hidden) or include_hidden:
         print(" " * indent, cmd.get_help(ctx).splitlines()[0])
-    commands = getattr(cmd, 'commands', {})
-    for sub in commands.values():
-        _recursive_help(sub, ctx, indent=indent + 2, include_hidden=include_hidden)
+    if not isinstance(cmd, click.Group):
+        return
+    for name in cmd.list_commands(ctx):  # also loads lazy subcommands
+        _recursive_help(cmd.get_command(ctx, name), ctx, indent=indent + 2, include_hidden=include_hidden)
 
 
 @cli.command(name='help', help='dump help for all commands')
@@ -484,11 +490,6 @@ def _recursive_help(cmd, parent=None, indent=0, include_hidden=False):
 def dumphelp(include_hidden):
     _recursive_help(cli, include_hidden=include_hidden)
 
-cli.add_command(tutorial)
-cli.add_command(recipes)
-cli.add_command(index)
-cli.add_command(internals)
-cli.add_command(demo)
 
 def main():
     config_logging('corgi_pg')
@@ -15,6 +15,7 @@ from psycopg2.extensions import (
 )
 from hprint import hprint as pprint
 from corgi_common.scriptutils import run_script
+from corgi_common.tableutils import stream_print
 # from corgi_common.timeutils import simple_timing
 # from collections import OrderedDict
 
@@ -123,9 +124,10 @@ def create_connection(ctx, isolation_level=ISOLATION_LEVEL_READ_COMMITTED):
 
 
 # def pg_cursor(host=None, port=45432, database='cbd', user='cbd', password=None, dict_like=True):
-def pg_cursor(host=None, dict_like=True, connection=None, **kwargs):
+def pg_cursor(host=None, dict_like=True, connection=None, name=None, **kwargs):
+    """name: create a named (server-side) cursor"""
     cursor = (connection or _get_pg_conn(host=host, **kwargs))\
-        .cursor(cursor_factory=(RealDictCursor if dict_like else None))
+        .cursor(name=name, cursor_factory=(RealDictCursor if dict_like else None))
     execute0 = cursor.execute
 
     def _execute(query, **kwargs):
@@ -158,6 +160,19 @@ def pg_execute(statement, *args, commit=True, **kwargs):
             click.secho(error, fg='red', err=True)
             cur.connection.rollback()
 
+def pg_iter_execute(statement, *args, itersize=2000, **kwargs):
+    """Yield rows of a query through a server-side cursor, fetching `itersize` rows per round trip"""
+    with pg_cursor(*args, name=f'corgi_{os.getpid()}', **kwargs) as cur:
+        cur.itersize = itersize
+        try:
+            cur.execute(statement)
+            for row in cur:
+                yield dict(row)
+        except (Exception, psycopg2.DatabaseError) as error:
+            click.secho(error, fg='red', err=True)
+        finally:
+            cur.connection.rollback()
+
 # def pg_query(statement, *args, **kwargs):
 #     with pg_cursor(*args, **kwargs) as cur:
 #         try:
@@ -206,6 +221,21 @@ def execute(
     finally:
         ctx.obj['isolation_level'] = isolation_level0
 
+def stream_execute(ctx, statement='', itersize=2000):
+    """Like execute, but rows are printed while being fetched (queries only)"""
+    if not statement:
+        statement = sys.stdin.read()
+    statement = statement.strip()
+    if ctx.obj.get('dry'):
+        print(statement)
+        return
+    fmt = 'ndjson' if ctx.obj['as_json'] else 'x' if ctx.obj['x'] else 'table'
+    if fmt == 'ndjson':     # NULL stays null
+        count = stream_print(pg_iter_execute(statement, itersize=itersize, **ctx.obj), fmt=fmt)
+    else:
+        count = stream_print(pg_iter_execute(statement, itersize=itersize, **ctx.obj), fmt=fmt, missing_value=null)
+    click.echo(f'({count} rows)', err=True)
+
 def select_all(ctx, table_name):
     execute(ctx, f"SELECT * FROM {table_name};")
 
@@ -8,6 +8,7 @@ import logging
 import pika
 import sys
 import requests
+from corgi_common.restutils import http_get
 from icecream import ic
 # from urllib3.parse import
 
@@ -24,7 +25,7 @@ def _uri(host, port, uri):
     return ic(url)
 
 def _rabbit_get(uri, host, port, username, password):
-    r = requests.get(_uri(host, port, uri), auth=(username, password))
+    r = http_get(_uri(host, port, uri), auth=(username, password))
     return r.json()
 
 
@@ -0,0 +1,86 @@
+import logging
+from collections import namedtuple
+import redis
+from click import echo
+from corgi_common.concurrency import get_executor
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3
+NODE_TIMEOUT = 10               # seconds allowed to each node
+MAX_WORKERS = 64                # nodes queried at the same time
+_UNHEALTHY_FLAGS = {'fail', 'noaddr', 'handshake'}
+
+
+class Node(namedtuple('Node', ['id', 'host', 'port', 'role', 'master_id', 'flags', 'slots'])):
+    __slots__ = ()
+
+    @property
+    def addr(self):
+        return f'{self.host}:{self.port}'
+
+
+def parse_cluster_nodes(text):
+    """Nodes of a CLUSTER NODES reply
+
+    <id> <ip:port@cport[,hostname]> <flags> <master> <ping-sent> <pong-recv> <config-epoch> <link-state> <slot> ...
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    nodes = []
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) < 8:
+            continue
+        address = fields[1].split(',')[0].split('@')[0]
+        host, _, port = address.rpartition(':')
+        flags = set(fields[2].split(','))
+        role = 'master' if 'master' in flags else 'replica' if 'slave' in flags else '?'
+        nodes.append(Node(fields[0], host, int(port), role, None if fields[3] == '-' else fields[3], flags, fields[8:]))
+    return nodes
+
+
+def discover(host, port, password=None, replicas=True):
+    """Healthy nodes of the cluster `host:port` belongs to, masters first"""
+    r = redis.Redis(host=host, port=port, password=password, socket_connect_timeout=CONNECT_TIMEOUT)
+    try:
+        nodes = parse_cluster_nodes(r.execute_command('CLUSTER', 'NODES'))
+    finally:
+        r.close()
+    healthy = []
+    for node in nodes:
+        if node.flags & _UNHEALTHY_FLAGS:
+            logger.warning(f"Skipping node {node.addr} ({','.join(sorted(node.flags))})")
+            continue
+        if node.host in ('', '0.0.0.0'):    # node announcing no address: reachable as the seed
+            node = node._replace(host=host)
+        if replicas or node.role == 'master':
+            healthy.append(node)
+    return sorted(healthy, key=lambda n: (n.role != 'master', n.host, n.port))
+
+
+def connect(node, password=None, **kwargs):
+    return redis.Redis(
+        host=node.host, port=node.port, password=password,
+        socket_connect_timeout=CONNECT_TIMEOUT, socket_timeout=NODE_TIMEOUT, **kwargs)
+
+
+def fan_out(nodes, fn, password=None, timeout=NODE_TIMEOUT, **kwargs):
+    """[(node, fn(client) or the exception raised)] of every node, queried concurrently"""
+    def _call(node):
+        r = connect(node, password, **kwargs)
+        try:
+            return fn(r)
+        finally:
+            r.close()
+    executor = get_executor('redis-cluster', max_workers=MAX_WORKERS)
+    return list(zip(nodes, executor.map(_call, nodes, timeout=timeout, return_exceptions=True)))
+
+
+def succeeded(results):
+    """(node, result) of fan_out results, failures are reported on stderr"""
+    for node, result in results:
+        if isinstance(result, Exception):
+            echo(f"[{node.addr}] {type(result).__name__}: {result or 'timed out'}", err=True)
+            continue
+        yield node, result
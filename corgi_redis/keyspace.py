@@ -0,0 +1,292 @@
+import re
+import sys
+import time
+import heapq
+import logging
+from collections import Counter
+from corgi_common import pretty_print
+from corgi_common.timeutils import timer
+
+logger = logging.getLogger(__name__)
+
+SCAN_COUNT = 1000
+PIPELINE_SIZE = 500             # keys inspected per round trip (4 commands each)
+MEMORY_SAMPLES = 5              # MEMORY USAGE default, 0 means all nested values
+COMMANDS_PER_KEY = 4            # TYPE, MEMORY USAGE, PTTL, OBJECT ENCODING
+
+_ID_SEGMENT = re.compile(r'^\d+$|^[0-9a-fA-F-]{16,}$')  # numeric ids, hashes, uuids ...
+
+
+class KeyspaceError(Exception):
+    pass
+
+
+def _is_id(segment):
+    """Numbers, hashes, uuids and mostly-digit segments (u1234, 2024-01-31), not names like v2, oauth2 or s3"""
+    if _ID_SEGMENT.match(segment):
+        return True
+    digits = sum(c.isdigit() for c in segment)
+    return digits * 2 > len(segment) and digits >= 3
+
+
+def key_pattern(key, delimiter=':', depth=3):
+    """Group key of `key`: id-like segments become '*', segments past `depth` are folded
+
+    > key_pattern('user:1234:session:af01...')
+    > 'user:*:session:*'
+    """
+    segments = key.split(delimiter) if delimiter else [key]
+    pattern = ['*' if _is_id(s) else s for s in segments[:depth]]
+    if len(segments) > depth:
+        pattern.append('*')
+    return delimiter.join(pattern) if delimiter else pattern[0]
+
+
+def human_bytes(n):
+    n = float(n)
+    for unit in ('B', 'K', 'M', 'G', 'T'):
+        if abs(n) < 1024 or unit == 'T':
+            return f'{n:.0f}{unit}' if unit == 'B' else f'{n:.1f}{unit}'
+        n /= 1024
+
+
+def _decode(key):
+    return key.decode('utf-8', errors='backslashreplace') if isinstance(key, bytes) else key
+
+
+class Throttle:
+    """Paces callers so that at most `rate` operations per second are issued (no limit if falsy)"""
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._next = time.monotonic()
+
+    def wait(self, ops=1):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + ops / self.rate
+
+
+class KeyspaceStats:
+    """Aggregates (key, type, bytes, ttl, encoding) records by key pattern
+
+    Also used for keys read from RDB files, where sizes are estimated.
+    `scale` multiplies counts and sizes of the reports when only a sample was seen.
+    """
+
+    def __init__(self, delimiter=':', depth=3, top=20):
+        self.delimiter = delimiter
+        self.depth = depth
+        self.top = top
+        self.keys = 0
+        self.bytes = 0
+        self.scale = 1.0
+        self.patterns = {}
+        self.types = {}
+        self._biggest = []      # min-heap of (bytes, key, type, encoding, ttl)
+
+    def add(self, key, type_, size, ttl=None, encoding=None):
+        key = _decode(key)
+        self.keys += 1
+        self.bytes += size
+        pattern = key_pattern(key, self.delimiter, self.depth)
+        p = self.patterns.get(pattern)
+        if p is None:
+            p = self.patterns[pattern] = {
+                'pattern': pattern, 'count': 0, 'bytes': 0, 'max_bytes': -1, 'biggest': None,
+                'no_ttl': 0, 'types': Counter(),
+            }
+        p['count'] += 1
+        p['bytes'] += size
+        p['types'][type_] += 1
+        if ttl is None or ttl < 0:
+            p['no_ttl'] += 1
+        if size > p['max_bytes']:
+            p['max_bytes'], p['biggest'] = size, key
+        t = self.types.get(type_)
+        if t is None:
+            t = self.types[type_] = {'type': type_, 'count': 0, 'bytes': 0, 'encodings': Counter()}
+        t['count'] += 1
+        t['bytes'] += size
+        if encoding:
+            t['encodings'][encoding] += 1
+        record = (size, key, type_, encoding, ttl)
+        if len(self._biggest) < self.top:
+            heapq.heappush(self._biggest, record)
+        elif size > self._biggest[0][0]:
+            heapq.heapreplace(self._biggest, record)
+
+    def merge(self, other):
+        """Add up stats gathered separately (e.g. by worker processes)"""
+        self.keys += other.keys
+        self.bytes += other.bytes
+        for pattern, o in other.patterns.items():
+            p = self.patterns.get(pattern)
+            if p is None:
+                self.patterns[pattern] = o
+                continue
+            for k in ('count', 'bytes', 'no_ttl'):
+                p[k] += o[k]
+            p['types'].update(o['types'])
+            if o['max_bytes'] > p['max_bytes']:
+                p['max_bytes'], p['biggest'] = o['max_bytes'], o['biggest']
+        for type_, o in other.types.items():
+            t = self.types.get(type_)
+            if t is None:
+                self.types[type_] = o
+                continue
+            t['count'] += o['count']
+            t['bytes'] += o['bytes']
+            t['encodings'].update(o['encodings'])
+        self._biggest = heapq.nlargest(self.top, self._biggest + other._biggest)
+        heapq.heapify(self._biggest)
+        return self
+
+    def biggest(self):
+        return sorted(self._biggest, reverse=True)
+
+    def report(self, x=False):
+        scale = self.scale
+        total = self.bytes or 1
+        pattern_mappings = {
+            'Pattern': 'pattern',
+            'Keys': ('count', lambda c: round(c * scale)),
+            'Memory': ('bytes', lambda b: human_bytes(b * scale)),
+            'Mem%': ('bytes', lambda b: f'{b / total * 100:.1f}'),
+            'Avg': ('avg', human_bytes),
+            'Max': ('max_bytes', human_bytes),
+            'Biggest key': 'biggest',
+            'Types': ('types', lambda t: ','.join(f'{k}:{round(v * scale)}' for k, v in t.most_common())),
+            'No TTL%': 'no_ttl_pct',
+        }
+        rows = [
+            {**p, 'avg': p['bytes'] / p['count'], 'no_ttl_pct': f"{p['no_ttl'] / p['count'] * 100:.0f}"}
+            for p in self.patterns.values()
+        ]
+        estimated = ' (estimated)' if scale != 1 else ''
+        print(f'Top {self.top} patterns by memory{estimated}:')
+        pretty_print(sorted(rows, key=lambda p: p['bytes'], reverse=True)[:self.top], mappings=pattern_mappings, x=x)
+        print()
+        print(f'Top {self.top} patterns by key count{estimated}:')
+        pretty_print(sorted(rows, key=lambda p: p['count'], reverse=True)[:self.top], mappings=pattern_mappings, x=x)
+        print()
+        print(f'Top {self.top} biggest keys{" (of the sample)" if estimated else ""}:')
+        pretty_print([
+            {'key': key, 'type': type_, 'encoding': encoding, 'bytes': size, 'ttl': ttl}
+            for size, key, type_, encoding, ttl in self.biggest()
+        ], mappings={
+            'Key': 'key',
+            'Type': 'type',
+            'Encoding': 'encoding',
+            'Memory': ('bytes', human_bytes),
+            'TTL(ms)': 'ttl',
+        }, x=x)
+        print()
+        print(f'By type{estimated}:')
+        pretty_print(sorted(self.types.values(), key=lambda t: t['bytes'], reverse=True), mappings={
+            'Type': 'type',
+            'Keys': ('count', lambda c: round(c * scale)),
+            'Memory': ('bytes', lambda b: human_bytes(b * scale)),
+            'Mem%': ('bytes', lambda b: f'{b / total * 100:.1f}'),
+            'Encodings': ('encodings', lambda e: ','.join(f'{k}:{round(v * scale)}' for k, v in e.most_common())),
+        }, x=x)
+        print()
+        print(f'Keys: {round(self.keys * scale)}{estimated}, memory: {human_bytes(self.bytes * scale)}{estimated}, '
+              f'patterns: {len(self.patterns)}')
+
+
+def scan_keys(r, match=None, count=SCAN_COUNT, throttle=None):
+    """Yield batches of keys of the whole keyspace, one SCAN call each"""
+    throttle = throttle or Throttle()
+    cursor = 0
+    while True:
+        throttle.wait()
+        cursor, keys = r.scan(cursor, match=match, count=count)
+        if keys:
+            yield keys
+        if cursor == 0:
+            return
+
+
+def random_keys(r, n, batch=PIPELINE_SIZE, throttle=None):
+    """Yield batches of `n` keys picked with RANDOMKEY (with replacement)"""
+    throttle = throttle or Throttle()
+    remaining = n
+    while remaining > 0:
+        size = min(batch, remaining)
+        throttle.wait(size)
+        pipe = r.pipeline(transaction=False)
+        for _ in range(size):
+            pipe.randomkey()
+        keys = [k for k in pipe.execute() if k is not None]
+        if not keys:            # empty db
+            return
+        remaining -= size
+        yield keys
+
+
+def inspect_keys(r, keys, samples=MEMORY_SAMPLES, throttle=None):
+    """Yield (key, type, bytes, pttl, encoding) of `keys` in one pipelined round trip,
+    keys deleted in the meantime are skipped
+
+    Raise KeyspaceError if MEMORY USAGE fails for the whole batch (disabled, renamed or not supported).
+    """
+    if throttle:
+        throttle.wait(len(keys) * COMMANDS_PER_KEY)
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.memory_usage(key, samples=samples)
+        pipe.pttl(key)
+        pipe.object('encoding', key)
+    with timer('redis.keyspace.pipeline'):
+        replies = pipe.execute(raise_on_error=False)
+    sizes = replies[1::COMMANDS_PER_KEY]
+    if sizes and all(isinstance(size, Exception) for size in sizes):
+        raise KeyspaceError(f"MEMORY USAGE failed: {sizes[0]} (disabled or renamed on this server? it is required)")
+    for i, key in enumerate(keys):
+        type_, size, ttl, encoding = replies[i * COMMANDS_PER_KEY:(i + 1) * COMMANDS_PER_KEY]
+        type_ = _decode(type_)
+        if type_ == 'none' or size is None or isinstance(size, Exception):
+            if isinstance(size, Exception):
+                logger.warning(f"MEMORY USAGE {_decode(key)}: {size}")
+            continue
+        yield (
+            key, type_, size,
+            None if isinstance(ttl, Exception) else ttl,
+            None if isinstance(encoding, Exception) else _decode(encoding),
+        )
+
+
+def _batches(keys, size):
+    for i in range(0, len(keys), size):
+        yield keys[i:i + size]
+
+
+def analyze(r, stats, match=None, count=SCAN_COUNT, pipeline=PIPELINE_SIZE, samples=MEMORY_SAMPLES,
+            sample=None, max_ops=None, progress=True):
+    """Feed `stats` with every key of `r` (SCAN), or with `sample` random keys
+    whose figures are then extrapolated to DBSIZE"""
+    throttle = Throttle(max_ops)
+    batches = random_keys(r, sample, pipeline, throttle) if sample else scan_keys(r, match, count, throttle)
+    dbsize = r.dbsize()
+    start = last_progress = time.monotonic()
+    seen = 0
+    for keys in batches:
+        for chunk in _batches(keys, pipeline):
+            for record in inspect_keys(r, chunk, samples, throttle):
+                stats.add(*record)
+            seen += len(chunk)
+        now = time.monotonic()
+        if progress and now - last_progress >= 1:
+            last_progress = now
+            print(f'\r{seen}/{sample or dbsize} keys, {seen / (now - start):.0f} keys/s ...', end='', file=sys.stderr)
+    if progress and last_progress != start:
+        print(file=sys.stderr)
+    if sample and stats.keys:
+        stats.scale = dbsize / stats.keys
+    return seen, time.monotonic() - start
@@ -1,12 +1,21 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 import click
-from corgi_common import config_logging, pretty_print, get
+from corgi_common import config_logging, pretty_print, get, bye
 from corgi_common.dateutils import pretty_duration, now
 from corgi_common.scriptutils import try_run_script_as_root
+from corgi_common.samplingutils import Sampler, CsvSink, NdjsonSink, PrometheusTextfileSink
+from corgi_common.columnarutils import ColumnarSink
+from . import keyspace
+from . import cluster as redis_cluster
+from . import slowlog as redis_slowlog
 import redis
+import os
+import sys
+import time
 import datetime
 import logging
+from functools import partial
 from pprint import pprint
 
 def _color(text):
@@ -99,13 +108,71 @@ def _get_cluster_metrics(host, port, password):
         },
     ]
 
+def _info_and_dbsize(r):
+    pipe = r.pipeline(transaction=False)
+    pipe.info()
+    pipe.dbsize()
+    return pipe.execute()
+
+
+def _cluster_info(host, port, password, x):
+    nodes = redis_cluster.discover(host, port, password)
+    rows = []
+    for node, (info_stats, dbsize) in redis_cluster.succeeded(redis_cluster.fan_out(nodes, _info_and_dbsize, password)):
+        maxmemory = get(info_stats, 'maxmemory', 0)
+        hits, misses = get(info_stats, 'keyspace_hits', 0), get(info_stats, 'keyspace_misses', 0)
+        rows.append({
+            'node': node.addr,
+            'role': node.role,
+            'slots': ' '.join(node.slots),
+            'version': info_stats['redis_version'],
+            'used_memory': info_stats['used_memory'],
+            'used_memory_human': _color(info_stats['used_memory_human']) if maxmemory and info_stats['used_memory'] / maxmemory > 0.8 else info_stats['used_memory_human'],
+            'frag': get(info_stats, 'mem_fragmentation_ratio', -1),
+            'ops': info_stats['instantaneous_ops_per_sec'],
+            'clients': info_stats['connected_clients'],
+            'keys': dbsize,
+            'hit_ratio': f'{hits / (hits + misses) * 100:.1f}%' if hits + misses else 'n/a',
+            'evicted_keys': get(info_stats, 'evicted_keys', 0),
+            'offset': get(info_stats, 'master_repl_offset', get(info_stats, 'slave_repl_offset')),
+        })
+    pretty_print(rows, mappings={
+        'Node': 'node',
+        'Role': 'role',
+        'Slots': 'slots',
+        'Version': 'version',
+        'Memory': 'used_memory_human',
+        'Frag': 'frag',
+        'Ops/s': 'ops',
+        'Clients': 'clients',
+        'Keys': 'keys',
+        'Hit%': 'hit_ratio',
+        'Evicted': 'evicted_keys',
+        'Repl offset': 'offset',
+    }, x=x)
+    masters = [row for row in rows if row['role'] == 'master']
+    print(f"Total ({len(rows)}/{len(nodes)} nodes): memory {sum(row['used_memory'] for row in rows) / 1024 / 1024 / 1024:.2f}G, "
+          f"ops/s {sum(row['ops'] for row in rows)}, clients {sum(row['clients'] for row in rows)}, "
+          f"keys {sum(row['keys'] for row in masters)} (masters)")
+    print()
+    pretty_print(_get_cluster_metrics(host, port, password), mappings={
+        'Metric': 'metric',
+        'Description': 'desc',
+        'Value': 'value',
+    }, x=x)
+
+
 @cli.command(help='Show redis usage info')
 @click.option('--host', '-h', default='localhost', show_default=True)
 @click.option('--port', '-p', default=6379, type=int, show_default=True)
 @click.option('--password')
 @click.option('--show-all', is_flag=True)
+@click.option('--cluster', is_flag=True, help='Query every node of the cluster concurrently')
 @click.option('-x', is_flag=True)
-def info(host, port, password, show_all, x):
+def info(host, port, password, show_all, cluster, x):
+    if cluster:
+        _cluster_info(host, port, password, x)
+        return
     r = redis.Redis(host=host, port=port, password=password)
     metrics = []
     dbsize = r.dbsize()
@@ -231,24 +298,132 @@ def info(host, port, password, show_all, x):
     }, x=x)
 
 
+@cli.command(help='Live INFO rates and deltas (ops/s, hit ratio, net, evictions, per command time ...)')
+@click.option('--host', '-h', default='localhost', show_default=True)
+@click.option('--port', '-p', default=6379, type=int, show_default=True)
+@click.option('--password')
+@click.option('--interval', '-i', default=1.0, type=float, show_default=True)
+@click.option('--count', '-c', type=int, help='Stop after this many samples')
+@click.option('--top', '-n', default=10, type=int, show_default=True, help='Commands shown')
+@click.option('--csv', 'csv_file', help='Also append samples to this csv file')
+@click.option('--ndjson', 'ndjson_file', help='Also append samples to this ndjson file')
+@click.option('--columnar', 'columnar_path', help='Also append samples to this columnar dataset (directory)')
+@click.option('--prometheus-textfile', help='Also expose latest metrics in this node_exporter textfile')
+def top(host, port, password, interval, count, top, csv_file, ndjson_file, columnar_path, prometheus_textfile):
+    from . import top as redis_top
+    r = redis.Redis(host=host, port=port, password=password)
+    collector = redis_top.InfoCollector(r)
+    sampler = Sampler(collector, interval=interval, counters=list(redis_top.COUNTERS))
+    sampler.sinks.append(redis_top.ScreenSink(sampler, collector, f'{host}:{port}', top=top))
+    if csv_file:
+        sampler.sinks.append(CsvSink(csv_file))
+    if ndjson_file:
+        sampler.sinks.append(NdjsonSink(ndjson_file))
+    if columnar_path:
+        sampler.sinks.append(ColumnarSink(columnar_path))
+    if prometheus_textfile:
+        sampler.sinks.append(PrometheusTextfileSink(prometheus_textfile, prefix='corgi_redis_', labels={'instance': f'{host}:{port}'}))
+    try:
+        sampler.run(count)
+    except KeyboardInterrupt:
+        pass
+
+
 @cli.command(help='Give an idea about load')
 @click.option('--host', '-h', default='localhost', show_default=True)
 @click.option('--port', '-p', default=6379, type=int, show_default=True)
 @click.option('--password')
-def load_info(host, port, password):
-    r = redis.StrictRedis(host=host, port=port, password=password)
-    result = [{'cmd': k.split('_')[1], "usec_per_call": int(v['usec_per_call'])} for k, v in r.info('commandstats').items()][:20]
-    result = sorted(result, key=lambda s: s['usec_per_call'], reverse=True)
+@click.option('--cluster', is_flag=True, help='Aggregate commandstats of every node of the cluster')
+def load_info(host, port, password, cluster):
+    if cluster:
+        nodes = redis_cluster.discover(host, port, password)
+        commandstats = [stats for _, stats in redis_cluster.succeeded(
+            redis_cluster.fan_out(nodes, lambda r: r.info('commandstats'), password))]
+        print(f'({len(commandstats)}/{len(nodes)} nodes)')
+    else:
+        commandstats = [redis.StrictRedis(host=host, port=port, password=password).info('commandstats')]
+    totals = {}
+    for stats in commandstats:
+        for k, v in stats.items():
+            if not k.startswith('cmdstat_'):
+                continue
+            calls_usec = totals.setdefault(k.split('_', 1)[1], [0, 0])
+            calls_usec[0] += v['calls']
+            calls_usec[1] += v['usec']
+    result = [{'cmd': cmd, 'calls': calls, "usec_per_call": int(usec / calls) if calls else 0} for cmd, (calls, usec) in totals.items()]
+    result = sorted(result, key=lambda s: s['usec_per_call'], reverse=True)[:20]
     for item in result:
         if item['usec_per_call'] > 100:
             item['usec_per_call'] = _color(item['usec_per_call'])
-    pretty_print(result, mappings={'Command': 'cmd', 'Average usec': 'usec_per_call'})
+    pretty_print(result, mappings={'Command': 'cmd', 'Calls': 'calls', 'Average usec': 'usec_per_call'})
     print('-----')
-    print('(Try `redis-cli -stat` to monitor load live)')
+    print('(Try `corgi_redis top` to monitor load live)')
 
-@cli.command(help='Scan bigkeys')
-def bigkeys():
-    print("Enough to use native cli: redis-cli --bigkeys")
+@cli.command(help='Analyze keyspace memory by key pattern (SCAN + pipelined MEMORY USAGE)')
+@click.option('--host', '-h', default='localhost', show_default=True)
+@click.option('--port', '-p', default=6379, type=int, show_default=True)
+@click.option('--password')
+@click.option('--db', default=0, type=int, show_default=True)
+@click.option('--match', '-m', help='Only keys matching this glob pattern (SCAN MATCH)')
+@click.option('--count', default=keyspace.SCAN_COUNT, type=int, show_default=True, help='SCAN COUNT hint')
+@click.option('--pipeline', default=keyspace.PIPELINE_SIZE, type=int, show_default=True, help='Keys inspected per round trip')
+@click.option('--samples', default=keyspace.MEMORY_SAMPLES, type=int, show_default=True, help='MEMORY USAGE SAMPLES (0: all nested values)')
+@click.option('--sample', type=int, help='Only inspect this many random keys (RANDOMKEY) and extrapolate to DBSIZE')
+@click.option('--max-ops', type=int, help='Max commands per second sent to the server')
+@click.option('--delimiter', '-d', default=':', show_default=True, help='Key segment delimiter for grouping')
+@click.option('--depth', default=3, type=int, show_default=True, help='Key segments kept in patterns')
+@click.option('--top', '-n', default=20, type=int, show_default=True)
+@click.option('-x', is_flag=True)
+def bigkeys(host, port, password, db, match, count, pipeline, samples, sample, max_ops, delimiter, depth, top, x):
+    r = redis.Redis(host=host, port=port, password=password, db=db)
+    stats = keyspace.KeyspaceStats(delimiter=delimiter, depth=depth, top=top)
+    try:
+        seen, elapsed = keyspace.analyze(
+            r, stats, match=match, count=count, pipeline=pipeline, samples=samples, sample=sample, max_ops=max_ops)
+    except keyspace.KeyspaceError as e:
+        bye(str(e))
+    stats.report(x=x)
+    print(f'({seen} keys inspected in {elapsed:.1f}s)')
+
+
+@cli.command(help='Analyze memory of a RDB dump offline, by key pattern', name='rdb-analyze')
+@click.argument('rdb_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--db', 'dbs', type=int, multiple=True, help='Only these databases (repeatable)')
+@click.option('--delimiter', '-d', default=':', show_default=True, help='Key segment delimiter for grouping')
+@click.option('--depth', default=3, type=int, show_default=True, help='Key segments kept in patterns')
+@click.option('--top', '-n', default=20, type=int, show_default=True)
+@click.option('--jobs', '-j', default=1, type=int, show_default=True, help='Worker processes, each parsing a slice of the dump')
+@click.option('-x', is_flag=True)
+def rdb_analyze(rdb_file, dbs, delimiter, depth, top, jobs, x):
+    from . import rdb
+    from corgi_common.concurrency import get_executor
+    start = time.monotonic()
+    with rdb.RdbParser(rdb_file) as parser:
+        version, aux = parser.version, parser.aux
+        ranges = parser.split(jobs)
+    options = dict(delimiter=delimiter, depth=depth, top=top, dbs=set(dbs) if dbs else None)
+    if len(ranges) == 1:
+        results = [rdb.analyze_range(rdb_file, **options)]
+    else:
+        executor = get_executor('rdb', max_workers=jobs, kind='process')
+        results = list(executor.map(partial(_analyze_rdb_range, rdb_file, options), ranges, return_exceptions=True))
+    stats, per_db = rdb.combine(rdb_file, ranges, results, **options)
+    print(f"RDB version {version}, redis {aux.get('redis-ver', 'n/a')}, used-mem {keyspace.human_bytes(int(aux.get('used-mem', 0)))} at dump time")
+    print()
+    stats.report(x=x)
+    print()
+    pretty_print([{'db': db, 'keys': count, 'bytes': size} for db, (count, size) in sorted(per_db.items())], mappings={
+        'DB': 'db',
+        'Keys': 'keys',
+        'Memory': ('bytes', keyspace.human_bytes),
+    }, x=x)
+    print(f'({keyspace.human_bytes(os.path.getsize(rdb_file))} parsed in {time.monotonic() - start:.1f}s)')
+
+
+def _analyze_rdb_range(rdb_file, options, key_range):
+    from . import rdb
+    start, end, db = key_range
+    return rdb.analyze_range(rdb_file, start, end, db, **options)
 
 
 @cli.command(help='Set configs')
@@ -282,24 +457,85 @@ def os_tuning():
         'sysctl -w net.core.somaxconn=4096 >> /etc/sysctl.conf',
     ]))
 
-@cli.command(help='Show slowlog')
+def _fetch_slowlogs(host, port, password, nodes, count):
+    """[(node address, (entries, SLOWLOG LEN))] of the node, or of every cluster node (`nodes`)"""
+    fetch = partial(redis_slowlog.fetch, count=count)
+    if nodes is None:
+        return [(f'{host}:{port}', fetch(redis.StrictRedis(host=host, port=port, password=password, db=0)))]
+    return [(node.addr, result) for node, result in redis_cluster.succeeded(redis_cluster.fan_out(nodes, fetch, password))]
+
+
+def _ms(us):
+    return f'{us / 1000:.1f}'
+
+
+def _aggregate_slowlog(host, port, password, nodes, count, slower_than, follow, interval, delimiter, by, top, x):
+    aggregator = redis_slowlog.SlowlogAggregator(delimiter=delimiter, min_duration=slower_than)
+    mappings = {
+        'Fingerprint': 'fingerprint',
+        'Count': 'count',
+        'Total(ms)': ('total', _ms),
+        'Avg(ms)': ('avg', _ms),
+        'p50(ms)': ('p50', _ms),
+        'p99(ms)': ('p99', _ms),
+        'Max(ms)': ('max', _ms),
+        **({'Nodes': 'nodes'} if nodes is not None else {}),
+        'Last seen': ('last_seen', lambda ts: datetime.datetime.fromtimestamp(ts)),
+        'Slowest': ('example', lambda c: c if len(c) <= 60 else c[:57] + '...'),
+    }
+    redraw = follow and sys.stdout.isatty()
+    try:
+        while True:
+            aggregator.poll((node, entries) for node, (entries, _) in _fetch_slowlogs(host, port, password, nodes, count))
+            if redraw:
+                click.clear()
+            pretty_print(aggregator.rows(by)[:top], mappings=mappings, x=x)
+            print(aggregator.summary())
+            if not follow:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command(help='Show slowlog, or aggregate it by command fingerprint')
 @click.option('--host', '-h', default='localhost', show_default=True)
 @click.option('--port', '-p', default=6379, type=int, show_default=True)
+@click.option('--password')
 @click.option('--slower-than', '-lt', default=1000, type=int, show_default=True)
 @click.option('--sort', is_flag=True)
-def slowlog(host, port, slower_than, sort):
-    r = redis.StrictRedis(host=host, port=port, db=0)
-    result = r.slowlog_get()
-    if sort:
-        result.sort(key=lambda item: item['duration'], reverse=True)
-    result = filter(lambda item: item['duration'] >= slower_than, result)
-    pretty_print(result, mappings={
+@click.option('--cluster', is_flag=True, help='Merge slowlogs of every node of the cluster')
+@click.option('--count', default=-1, type=int, show_default=True, help='Entries fetched per node (-1: the whole log)')
+@click.option('--aggregate', '-a', is_flag=True, help='Aggregate by command + key pattern (count, total, p50/p99, max)')
+@click.option('--follow', '-f', is_flag=True, help='Keep polling and aggregating new entries (implies --aggregate)')
+@click.option('--interval', '-i', default=10.0, type=float, show_default=True, help='Seconds between polls (--follow)')
+@click.option('--by', type=click.Choice(['total', 'count', 'avg', 'p99', 'max']), default='total', show_default=True, help='Aggregate sort order')
+@click.option('--delimiter', '-d', default=':', show_default=True, help='Key segment delimiter for fingerprints')
+@click.option('--top', '-n', default=20, type=int, show_default=True, help='Fingerprints shown')
+@click.option('-x', is_flag=True)
+def slowlog(host, port, password, slower_than, sort, cluster, count, aggregate, follow, interval, by, delimiter, top, x):
+    nodes = redis_cluster.discover(host, port, password) if cluster else None
+    if aggregate or follow:
+        _aggregate_slowlog(host, port, password, nodes, count, slower_than, follow, interval, delimiter, by, top, x)
+        return
+    mappings = {
         'ID': 'id',
         'Start': ('start_time', lambda ts: datetime.datetime.fromtimestamp(ts)),
         'Duration': ('duration', lambda d: f'{d // 1000}ms,{d % 1000}us'),
-        'Command': ('command', lambda c: c.decode('utf-8'))
-    })
-    print(f'(total: {r.slowlog_len()})')
+        'Command': 'command',
+    }
+    result, total = [], 0
+    for node, (entries, length) in _fetch_slowlogs(host, port, password, nodes, count):
+        result += [{**entry, 'node': node} for entry in entries]
+        total += length
+    if cluster:
+        result.sort(key=lambda item: item['start_time'], reverse=True)
+        mappings = {'Node': 'node', **mappings}
+    if sort:
+        result.sort(key=lambda item: item['duration'], reverse=True)
+    result = filter(lambda item: item['duration'] >= slower_than, result)
+    pretty_print(result, mappings=mappings, x=x)
+    print(f'(total: {total})')
 
 
 @cli.command(help='Test memory')
@@ -381,11 +617,23 @@ def channels(host, port):
 @cli.command(help='Show clients info')
 @click.option('--host', '-h', default='localhost', show_default=True)
 @click.option('--port', '-p', default=6379, type=int, show_default=True)
+@click.option('--password')
+@click.option('--cluster', is_flag=True, help='Clients of every node of the cluster')
 @click.option('-x', is_flag=True)
-def clients(host, port, x):
+def clients(host, port, password, cluster, x):
     '''https://redis.io/commands/client-list/'''
-    r = redis.StrictRedis(host=host, port=port, client_name='corgi')
-    pretty_print(r.client_list(), mappings={
+    if cluster:
+        nodes = redis_cluster.discover(host, port, password)
+        client_list = [
+            {**client, 'node': node.addr}
+            for node, node_clients in redis_cluster.succeeded(
+                redis_cluster.fan_out(nodes, lambda r: r.client_list(), password, client_name='corgi'))
+            for client in node_clients
+        ]
+    else:
+        client_list = redis.StrictRedis(host=host, port=port, password=password, client_name='corgi').client_list()
+    pretty_print(client_list, mappings={
+        **({'Node': 'node'} if cluster else {}),
         'ID': 'id',
         # 'Addr': 'addr',
         'Name': 'name',
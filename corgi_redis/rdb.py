@@ -0,0 +1,511 @@
+"""Streaming RDB parser estimating per-key memory without loading values
+
+The dump is memory-mapped and walked once: lengths and string headers are
+decoded, values are skipped over (ziplist/listpack/intset blobs are sized
+from their length, LZF payloads are never inflated except for key names).
+Memory estimates follow the server's in-memory layout (64-bit, jemalloc
+size classes) and are meant for comparisons, not exact accounting.
+
+https://rdb.fnordig.de/file_format.html
+"""
+import os
+import mmap
+import time
+import struct
+import logging
+from collections import namedtuple
+from .keyspace import KeyspaceStats
+
+logger = logging.getLogger(__name__)
+
+MAX_VERSION = 12                # redis 7.4
+
+OPCODE_SLOT_INFO = 0xF4
+OPCODE_FUNCTION2 = 0xF5
+OPCODE_FUNCTION_PRE_GA = 0xF6
+OPCODE_MODULE_AUX = 0xF7
+OPCODE_IDLE = 0xF8
+OPCODE_FREQ = 0xF9
+OPCODE_AUX = 0xFA
+OPCODE_RESIZEDB = 0xFB
+OPCODE_EXPIRETIME_MS = 0xFC
+OPCODE_EXPIRETIME = 0xFD
+OPCODE_SELECTDB = 0xFE
+OPCODE_EOF = 0xFF
+
+# value type -> (type, encoding)
+TYPES = {
+    0: ('string', None),        # encoding depends on the value
+    1: ('list', 'linkedlist'),
+    2: ('set', 'hashtable'),
+    3: ('zset', 'skiplist'),
+    4: ('hash', 'hashtable'),
+    5: ('zset', 'skiplist'),
+    7: ('module', 'module'),
+    9: ('hash', 'zipmap'),
+    10: ('list', 'ziplist'),
+    11: ('set', 'intset'),
+    12: ('zset', 'ziplist'),
+    13: ('hash', 'ziplist'),
+    14: ('list', 'quicklist'),
+    15: ('stream', 'stream'),
+    16: ('hash', 'listpack'),
+    17: ('zset', 'listpack'),
+    18: ('list', 'quicklist'),
+    19: ('stream', 'stream'),
+    20: ('set', 'listpack'),
+    21: ('stream', 'stream'),
+}
+_BLOB_TYPES = frozenset((9, 10, 11, 12, 13, 16, 17, 20))
+# first byte of a key entry (or of a db section)
+_ENTRY_OPCODES = frozenset(TYPES) | {
+    OPCODE_EXPIRETIME_MS, OPCODE_EXPIRETIME, OPCODE_IDLE, OPCODE_FREQ, OPCODE_SELECTDB, OPCODE_RESIZEDB}
+
+RESYNC_ENTRIES = 32             # key entries that must parse back to back from a split offset
+RESYNC_WINDOW = 1 << 20         # bytes searched (and parsed) past a split target
+
+MODULE_OPCODE_EOF, MODULE_OPCODE_SINT, MODULE_OPCODE_UINT, MODULE_OPCODE_FLOAT, MODULE_OPCODE_DOUBLE, MODULE_OPCODE_STRING = range(6)
+
+# in-memory sizes of server structures (64-bit)
+ROBJ = 16
+DICT_ENTRY = 24
+DICT = 56
+QUICKLIST = 40
+QUICKLIST_NODE = 32
+SKIPLIST_NODE = 48              # score, backward, ~1.33 levels
+STREAM_RAX_NODE = 64
+EMBSTR_LIMIT = 44
+
+RdbKey = namedtuple('RdbKey', ['db', 'key', 'type', 'encoding', 'bytes', 'expire_ms'])
+# analyze_range result, `lead`: keys seen before the first SELECTDB of a range started with an unknown db,
+# `end`: offset parsing stopped at (None at EOF), `db`: db selected there (None if still unknown)
+RangeResult = namedtuple('RangeResult', ['stats', 'per_db', 'lead', 'end', 'db'])
+
+
+class RdbError(Exception):
+    pass
+
+
+def malloc_size(n):
+    """jemalloc size class of an n-byte allocation"""
+    if n <= 8:
+        return 8
+    if n <= 128:
+        return (n + 15) & ~15
+    step = 1 << ((n - 1).bit_length() - 3)     # 4 classes per power of 2
+    return (n + step - 1) & ~(step - 1)
+
+
+def sds_size(n):
+    header = 3 if n < 256 else 5 if n < 65536 else 9
+    return malloc_size(header + n + 1)
+
+
+def _table_size(n):
+    return malloc_size((1 << max(2, (n - 1).bit_length())) * 8) + malloc_size(DICT)
+
+
+def lzf_decompress(data, length):
+    out = bytearray()
+    ip = 0
+    end = len(data)
+    while ip < end:
+        ctrl = data[ip]
+        ip += 1
+        if ctrl < 32:               # literal run
+            out += data[ip:ip + ctrl + 1]
+            ip += ctrl + 1
+            continue
+        n = ctrl >> 5               # back reference
+        if n == 7:
+            n += data[ip]
+            ip += 1
+        ref = len(out) - ((ctrl & 0x1f) << 8) - data[ip] - 1
+        ip += 1
+        for i in range(ref, ref + n + 2):   # may overlap what it writes
+            out.append(out[i])
+    if len(out) != length:
+        raise RdbError(f"Corrupted LZF string ({len(out)} bytes instead of {length})")
+    return bytes(out)
+
+
+class RdbParser:
+    """Walks an RDB file, see keys()"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.m = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self.m, 'madvise'):
+            self.m.madvise(mmap.MADV_SEQUENTIAL)
+        if self.m[:5] != b'REDIS':
+            raise RdbError(f"{path} is not a RDB file")
+        self.version = int(self.m[5:9])
+        if self.version > MAX_VERSION:
+            logger.warning(f"RDB version {self.version} is newer than {MAX_VERSION}, parsing may fail")
+        self.aux = {}
+        self.pos = 9
+        self.eof = False
+        self.db = None
+        while self.m[self.pos] == OPCODE_AUX:   # header fields, needed by workers starting mid-file
+            self.pos += 1
+            name = self._string().decode('utf-8', errors='replace')
+            self.aux[name] = self._string().decode('utf-8', errors='replace')
+
+    def close(self):
+        self.m.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # primitives, each advancing self.pos
+
+    def _length(self):
+        """(length, is_special_encoding)"""
+        m = self.m
+        pos = self.pos
+        b = m[pos]
+        kind = b >> 6
+        if kind == 0:
+            self.pos = pos + 1
+            return b & 0x3F, False
+        if kind == 1:
+            self.pos = pos + 2
+            return ((b & 0x3F) << 8) | m[pos + 1], False
+        if kind == 3:
+            self.pos = pos + 1
+            return b & 0x3F, True
+        if b == 0x80:
+            self.pos = pos + 5
+            return struct.unpack_from('>I', m, pos + 1)[0], False
+        if b == 0x81:
+            self.pos = pos + 9
+            return struct.unpack_from('>Q', m, pos + 1)[0], False
+        raise RdbError(f"Invalid length encoding {b:#x} at offset {pos}")
+
+    def _len(self):
+        n, special = self._length()
+        if special:
+            raise RdbError(f"Unexpected string encoding at offset {self.pos - 1}")
+        return n
+
+    def _skip_string(self):
+        """Skip a string, return (length, is_int)"""
+        n, special = self._length()
+        if not special:
+            self.pos += n
+            return n, False
+        if n <= 2:              # int8/16/32
+            self.pos += 1 << n
+            return 1 << n, True
+        if n == 3:              # LZF
+            compressed = self._len()
+            length = self._len()
+            self.pos += compressed
+            return length, False
+        raise RdbError(f"Invalid string encoding {n} at offset {self.pos - 1}")
+
+    def _string(self):
+        n, special = self._length()
+        pos = self.pos
+        if not special:
+            self.pos += n
+            return self.m[pos:pos + n]
+        if n <= 2:
+            size = 1 << n
+            self.pos += size
+            return str(int.from_bytes(self.m[pos:pos + size], 'little', signed=True)).encode()
+        if n == 3:
+            compressed = self._len()
+            length = self._len()
+            pos = self.pos
+            self.pos += compressed
+            return lzf_decompress(self.m[pos:pos + compressed], length)
+        raise RdbError(f"Invalid string encoding {n} at offset {pos - 1}")
+
+    def _skip_module_values(self):
+        while True:
+            opcode = self._len()
+            if opcode == MODULE_OPCODE_EOF:
+                return
+            if opcode in (MODULE_OPCODE_SINT, MODULE_OPCODE_UINT):
+                self._len()
+            elif opcode == MODULE_OPCODE_FLOAT:
+                self.pos += 4
+            elif opcode == MODULE_OPCODE_DOUBLE:
+                self.pos += 8
+            elif opcode == MODULE_OPCODE_STRING:
+                self._skip_string()
+            else:
+                raise RdbError(f"Invalid module opcode {opcode} at offset {self.pos}")
+
+    # values
+
+    def _strings_size(self, count, per_item):
+        """Skip `count` strings, return their estimated size with `per_item` overhead each"""
+        total = 0
+        skip = self._skip_string
+        for _ in range(count):
+            total += sds_size(skip()[0]) + per_item
+        return total
+
+    def _value(self, value_type):
+        """Skip a value, return (encoding, estimated bytes)"""
+        if value_type == 0:
+            length, is_int = self._skip_string()
+            if is_int:
+                return 'int', 0
+            if length <= EMBSTR_LIMIT:
+                return 'embstr', malloc_size(ROBJ + 3 + length + 1) - ROBJ
+            return 'raw', sds_size(length)
+        encoding = TYPES[value_type][1] if value_type in TYPES else None
+        if value_type in _BLOB_TYPES:
+            return encoding, malloc_size(self._skip_string()[0])
+        if value_type in (1, 2):
+            n = self._len()
+            overhead = 0 if value_type == 1 else malloc_size(DICT_ENTRY)
+            return encoding, _table_size(n) * (value_type == 2) + self._strings_size(n, overhead)
+        if value_type == 4:
+            n = self._len()
+            return encoding, _table_size(n) + self._strings_size(2 * n, 0) + n * malloc_size(DICT_ENTRY)
+        if value_type in (3, 5):
+            n = self._len()
+            size = _table_size(n)
+            for _ in range(n):
+                size += sds_size(self._skip_string()[0]) + malloc_size(DICT_ENTRY) + malloc_size(SKIPLIST_NODE)
+                if value_type == 5:
+                    self.pos += 8
+                else:
+                    self.pos += 1 + (self.m[self.pos] if self.m[self.pos] < 253 else 0)
+            return encoding, size
+        if value_type in (14, 18):
+            n = self._len()
+            size = malloc_size(QUICKLIST)
+            for _ in range(n):
+                if value_type == 18:
+                    self._len()     # container: plain or packed
+                size += malloc_size(QUICKLIST_NODE) + malloc_size(self._skip_string()[0])
+            return encoding, size
+        if value_type in (15, 19, 21):
+            return encoding, self._skip_stream(value_type)
+        if value_type == 7:
+            start = self.pos
+            self._len()             # module id
+            self._skip_module_values()
+            return encoding, self.pos - start
+        raise RdbError(f"Unsupported value type {value_type} at offset {self.pos - 1}")
+
+    def _skip_stream(self, value_type):
+        size = 0
+        for _ in range(self._len()):
+            self._skip_string()     # master entry id
+            size += malloc_size(self._skip_string()[0]) + STREAM_RAX_NODE
+        self._len()                 # items
+        self._len(), self._len()    # last id
+        if value_type >= 19:
+            for _ in range(5):      # first id, max deleted id, entries added
+                self._len()
+        for _ in range(self._len()):    # consumer groups
+            self._skip_string()
+            self._len(), self._len()
+            if value_type >= 19:
+                self._len()         # entries read
+            for _ in range(self._len()):    # pending entries: id, delivery time, delivery count
+                self.pos += 16 + 8
+                self._len()
+            for _ in range(self._len()):    # consumers
+                self._skip_string()
+                self.pos += 8 if value_type < 21 else 16    # seen (and active) time
+                pending = self._len()
+                self.pos += pending * 16
+        return size
+
+    # records
+
+    def keys(self, start=None, end=None, db=0):
+        """Yield RdbKey of every key, from offset `start` (a key boundary, see split()) up to `end`
+
+        `db` is the db of the keys before the first SELECTDB, None when starting mid-file.
+        """
+        m = self.m
+        self.pos = 9 if start is None else start
+        self.eof = False
+        self.db = db
+        expire_ms = None
+        entry = self.pos            # first byte of the current key entry (incl. expiry/idle/freq)
+        while True:
+            if end is not None and entry >= end:
+                return
+            opcode = m[self.pos]
+            self.pos += 1
+            if opcode == OPCODE_EXPIRETIME_MS:
+                expire_ms = struct.unpack_from('<q', m, self.pos)[0]
+                self.pos += 8
+            elif opcode == OPCODE_EXPIRETIME:
+                expire_ms = struct.unpack_from('<i', m, self.pos)[0] * 1000
+                self.pos += 4
+            elif opcode == OPCODE_IDLE:
+                self._len()
+            elif opcode == OPCODE_FREQ:
+                self.pos += 1
+            elif opcode == OPCODE_SELECTDB:
+                db = self.db = self._len()
+                entry = self.pos
+            elif opcode == OPCODE_RESIZEDB:
+                self._len(), self._len()
+                entry = self.pos
+            elif opcode == OPCODE_AUX:
+                self._skip_string(), self._skip_string()
+                entry = self.pos
+            elif opcode == OPCODE_SLOT_INFO:
+                self._len(), self._len(), self._len()
+                entry = self.pos
+            elif opcode == OPCODE_MODULE_AUX:
+                self._len()
+                self._skip_module_values()
+                entry = self.pos
+            elif opcode == OPCODE_FUNCTION2:
+                self._skip_string()
+                entry = self.pos
+            elif opcode == OPCODE_EOF:
+                self.eof = True
+                return
+            elif opcode == OPCODE_FUNCTION_PRE_GA:
+                raise RdbError("Functions saved by a pre-GA redis 7 are not supported")
+            else:
+                key = self._string()
+                encoding, size = self._value(opcode)
+                type_ = TYPES[opcode][0]
+                size += malloc_size(DICT_ENTRY) + sds_size(len(key)) + ROBJ
+                if expire_ms is not None:
+                    size += malloc_size(DICT_ENTRY)
+                yield RdbKey(db, key, type_, encoding, size, expire_ms)
+                expire_ms = None
+                entry = self.pos
+
+    def _resync(self, pos, at_end):
+        """End of the first key entry parsed from `pos` if RESYNC_ENTRIES entries (or all of them up to EOF) parse,
+        None otherwise. Not `pos` itself: it may be a key whose expiry or LRU/LFU prefix was missed."""
+        first = None
+        count = 0
+        try:
+            for record in self.keys(pos, db=None):
+                if not record.key:      # legal, but what runs of zero bytes look like
+                    return None
+                count += 1
+                if first is None:
+                    first = self.pos
+                if count > RESYNC_ENTRIES:
+                    return first
+        except Exception:       # anything goes from an offset inside a value
+            return None
+        if self.eof and at_end and len(self.m) - self.pos in (0, 8):   # 8: checksum
+            return first
+        return None
+
+    def boundary(self, offset):
+        """First offset at or after `offset` from which key entries parse, None if none within RESYNC_WINDOW
+
+        RDB files have no sync marks, so this is a guess (values may hold anything):
+        analyze_range results of the ranges split at it are checked to chain up, see combine().
+        Candidates are parsed from a copy of the window, so that garbage lengths fail fast.
+        """
+        m = self.m
+        window = self.m[offset:offset + RESYNC_WINDOW]
+        at_end = offset + len(window) == self.size
+        self.m = window
+        try:
+            for candidate in range(len(window)):
+                if window[candidate] in _ENTRY_OPCODES:
+                    start = self._resync(candidate, at_end)
+                    if start is not None:
+                        return offset + start
+        finally:
+            self.m = m
+        return None
+
+    def split(self, n):
+        """[(start, end, db)] key ranges of about the same size in bytes
+
+        Split offsets are found by resyncing on key entries near n-1 evenly spaced offsets (see boundary()),
+        the file is not parsed up to them. The db of every range but the first is unknown (None).
+        """
+        if n <= 1:
+            return [(None, None, 0)]
+        starts = []
+        for target in (self.size * i // n for i in range(1, n)):
+            if starts and target < starts[-1]:
+                continue
+            start = self.boundary(target)
+            if start is None:
+                logger.info(f"No key boundary found near offset {target}, one job less")
+            elif not starts or start > starts[-1]:
+                starts.append(start)
+        ends = starts + [None]
+        return [(None, ends[0], 0)] + [(start, end, None) for start, end in zip(starts, ends[1:])]
+
+
+def _ttl(expire_ms, now_ms):
+    return None if expire_ms is None else max(0, expire_ms - now_ms)
+
+
+def analyze_range(path, start=None, end=None, db=0, delimiter=':', depth=3, top=20, dbs=None):
+    """RangeResult of the keys of a RDB range, runs in worker processes"""
+    stats = KeyspaceStats(delimiter=delimiter, depth=depth, top=top)
+    lead = KeyspaceStats(delimiter=delimiter, depth=depth, top=top)
+    per_db = {}
+    with RdbParser(path) as parser:
+        # TTLs relative to the dump time
+        now_ms = int(parser.aux['ctime']) * 1000 if 'ctime' in parser.aux else int(time.time() * 1000)
+        for record in parser.keys(start, end, db):
+            if record.db is None:
+                lead.add(record.key, record.type, record.bytes, _ttl(record.expire_ms, now_ms), record.encoding)
+                continue
+            if dbs is not None and record.db not in dbs:
+                continue
+            stats.add(record.key, record.type, record.bytes, _ttl(record.expire_ms, now_ms), record.encoding)
+            counters = per_db.setdefault(record.db, [0, 0])
+            counters[0] += 1
+            counters[1] += record.bytes
+        return RangeResult(stats, per_db, lead, None if parser.eof else parser.pos, parser.db)
+
+
+def combine(path, ranges, results, delimiter=':', depth=3, top=20, dbs=None):
+    """(KeyspaceStats, {db: [keys, bytes]}) of the analyze_range results of consecutive `ranges`
+
+    A range that failed, or whose start isn't where the previous range stopped, was split
+    inside a value (see RdbParser.boundary): it is analyzed again from there. Keys seen
+    before the first SELECTDB of a range belong to the db the previous range ended in.
+    """
+    stats = KeyspaceStats(delimiter=delimiter, depth=depth, top=top)
+    per_db = {}
+    position, db = None, 0      # where (None: EOF) and in which db the previous range stopped
+    for (start, end, _), result in zip(ranges, results):
+        if start is None and isinstance(result, Exception):
+            raise result
+        if start is not None:
+            if position is None:
+                break
+            if start != position or isinstance(result, Exception):
+                logger.warning(f"Split offset {start} is not a key boundary ({result if isinstance(result, Exception) else 'mismatch'}), "
+                               f"analyzing again from {position}")
+                result = analyze_range(path, position, end, db, delimiter=delimiter, depth=depth, top=top, dbs=dbs)
+        stats.merge(result.stats)
+        for range_db, (count, size) in result.per_db.items():
+            counters = per_db.setdefault(range_db, [0, 0])
+            counters[0] += count
+            counters[1] += size
+        if result.lead.keys and (dbs is None or db in dbs):
+            stats.merge(result.lead)
+            counters = per_db.setdefault(db, [0, 0])
+            counters[0] += result.lead.keys
+            counters[1] += result.lead.bytes
+        position = result.end
+        if result.db is not None:
+            db = result.db
+    return stats, per_db
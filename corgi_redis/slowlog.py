@@ -0,0 +1,153 @@
+import re
+import time
+from corgi_common.timeutils import LatencyHistogram
+from .keyspace import key_pattern
+
+# commands whose first argument is a subcommand rather than a key
+_CONTAINER_COMMANDS = {
+    'ACL', 'CLIENT', 'CLUSTER', 'COMMAND', 'CONFIG', 'DEBUG', 'FUNCTION', 'LATENCY', 'MEMORY', 'MODULE',
+    'OBJECT', 'PUBSUB', 'SCRIPT', 'SLOWLOG', 'XGROUP', 'XINFO',
+}
+# commands without key (or with a pattern/script first)
+_KEYLESS_COMMANDS = {
+    'AUTH', 'BGREWRITEAOF', 'BGSAVE', 'DBSIZE', 'ECHO', 'EXEC', 'FLUSHALL', 'FLUSHDB', 'HELLO', 'INFO', 'KEYS',
+    'LASTSAVE', 'MULTI', 'PING', 'PSUBSCRIBE', 'PUBLISH', 'RANDOMKEY', 'SAVE', 'SCAN', 'SELECT', 'SUBSCRIBE',
+    'SWAPDB', 'TIME', 'WAIT', 'EVAL', 'EVALSHA', 'EVAL_RO', 'EVALSHA_RO', 'FCALL', 'FCALL_RO',
+}
+_MORE_ARGUMENTS = re.compile(r'^\.\.\. \((\d+) more arguments\)$')   # slowlog truncates long commands
+
+
+def _decode(v):
+    return v.decode('utf-8', errors='backslashreplace') if isinstance(v, bytes) else str(v)
+
+
+def parse_entry(item):
+    """SLOWLOG GET entry: id, start_time, duration (us), args, client (addr), client_name"""
+    args = item[3] if isinstance(item[3], list) else item[4]   # Redis Enterprise inserts complexity info at [3]
+    rest = item[4:] if isinstance(item[3], list) else item[5:]
+    args = [_decode(a) for a in args]
+    return {
+        'id': item[0],
+        'start_time': int(item[1]),
+        'duration': int(item[2]),
+        'args': args,
+        'command': ' '.join(args),
+        'client': _decode(rest[0]) if len(rest) > 0 else '',
+        'client_name': _decode(rest[1]) if len(rest) > 1 else '',
+    }
+
+
+def fetch(r, count=-1):
+    """(entries, SLOWLOG LEN) in one round trip, count -1 means the whole log"""
+    pipe = r.pipeline(transaction=False)
+    pipe.execute_command('SLOWLOG', 'GET', count)   # not slowlog_get(): it joins the arguments
+    pipe.slowlog_len()
+    items, length = pipe.execute()
+    return [parse_entry(item) for item in items], length
+
+
+def fingerprint(args, delimiter=':', depth=3):
+    """Command name (and subcommand) + key pattern, argument values dropped
+
+    > fingerprint(['HSET', 'user:42:profile', 'name', 'bob'])
+    > 'HSET user:*:profile ...'
+    """
+    if not args:
+        return '?'
+    command = args[0].upper()
+    rest = args[1:]
+    if rest and _MORE_ARGUMENTS.match(rest[-1]):
+        rest = rest[:-1]
+    if command in _CONTAINER_COMMANDS and rest:
+        command = f'{command} {rest[0].upper()}'
+        rest = rest[1:]
+    elif rest and command not in _KEYLESS_COMMANDS:
+        command = f'{command} {key_pattern(rest[0], delimiter, depth)}'
+        rest = rest[1:]
+    return f'{command} ...' if rest else command
+
+
+class SlowlogAggregator:
+    """Running aggregate of slowlog entries by fingerprint, fed by repeated polls of several nodes
+
+    Entries are deduplicated with a per node high-water mark of slowlog ids
+    (ids only grow, a smaller max id means the log was reset or the node restarted).
+    `missed` counts entries rotated out of the log between two polls.
+    """
+
+    def __init__(self, delimiter=':', depth=3, min_duration=0):
+        self.delimiter = delimiter
+        self.depth = depth
+        self.min_duration = min_duration
+        self.fingerprints = {}
+        self.entries = 0
+        self.missed = 0
+        self.polls = 0
+        self._last_ids = {}
+
+    def add(self, node, entries):
+        """Aggregate entries of `node` not seen yet, return how many were new"""
+        if not entries:
+            return 0
+        last_id = self._last_ids.get(node)
+        max_id = max(e['id'] for e in entries)
+        if last_id is not None and max_id < last_id:
+            last_id = None      # reset / restart
+        new = [e for e in entries if last_id is None or e['id'] > last_id]
+        if last_id is not None and new:
+            self.missed += max(0, min(e['id'] for e in new) - last_id - 1)
+        self._last_ids[node] = max_id
+        for e in new:
+            if e['duration'] >= self.min_duration:
+                self._add(node, e)
+        return len(new)
+
+    def _add(self, node, entry):
+        key = fingerprint(entry['args'], self.delimiter, self.depth)
+        f = self.fingerprints.get(key)
+        if f is None:
+            f = self.fingerprints[key] = {
+                'fingerprint': key, 'count': 0, 'total': 0, 'max': 0, 'histogram': LatencyHistogram(),
+                'nodes': set(), 'first_seen': entry['start_time'], 'last_seen': entry['start_time'], 'example': entry['command'],
+            }
+        duration = entry['duration']
+        f['count'] += 1
+        f['total'] += duration
+        f['histogram'].record(duration * 1000)      # us -> ns
+        f['nodes'].add(node)
+        f['first_seen'] = min(f['first_seen'], entry['start_time'])
+        if entry['start_time'] >= f['last_seen']:
+            f['last_seen'] = entry['start_time']
+        if duration > f['max']:
+            f['max'], f['example'] = duration, entry['command']
+        self.entries += 1
+
+    def poll(self, results):
+        """Add fan_out style [(node, entries)], count a poll"""
+        self.polls += 1
+        return sum(self.add(node, entries) for node, entries in results)
+
+    def rows(self, sort='total'):
+        """Aggregates as dicts (durations in us), sorted by `sort` descending"""
+        rows = []
+        for f in self.fingerprints.values():
+            summary = f['histogram'].summary()
+            rows.append({
+                'fingerprint': f['fingerprint'],
+                'count': f['count'],
+                'total': f['total'],
+                'avg': f['total'] / f['count'],
+                'p50': summary['p50'] / 1000,
+                'p99': summary['p99'] / 1000,
+                'max': f['max'],
+                'nodes': len(f['nodes']),
+                'first_seen': f['first_seen'],
+                'last_seen': f['last_seen'],
+                'example': f['example'],
+            })
+        return sorted(rows, key=lambda row: row[sort], reverse=True)
+
+    def summary(self):
+        return (f"{self.entries} slow entries, {len(self.fingerprints)} fingerprints, {len(self._last_ids)} node(s), "
+                f"{self.polls} poll(s){f', {self.missed} rotated out unseen' if self.missed else ''} "
+                f"(as of {time.strftime('%H:%M:%S')})")
@@ -0,0 +1,138 @@
+import sys
+import math
+import time
+from datetime import datetime
+from click import echo
+from tabulate import tabulate
+from corgi_common.dateutils import pretty_duration
+from corgi_common.samplingutils import Sink, sparkline
+from .keyspace import human_bytes
+
+# column: INFO field, per second rates of these are shown
+COUNTERS = {
+    'ops': 'total_commands_processed',
+    'hits': 'keyspace_hits',
+    'misses': 'keyspace_misses',
+    'net_in': 'total_net_input_bytes',
+    'net_out': 'total_net_output_bytes',
+    'expired': 'expired_keys',
+    'evicted': 'evicted_keys',
+    'conns': 'total_connections_received',
+    'rejected': 'rejected_connections',
+    'errors': 'total_error_replies',
+}
+GAUGES = {
+    'clients': 'connected_clients',
+    'blocked': 'blocked_clients',
+    'used_mem': 'used_memory',
+    'rss': 'used_memory_rss',
+    'frag': 'mem_fragmentation_ratio',
+}
+_BYTES = ('net_in', 'net_out', 'used_mem', 'rss')
+
+
+def _number(v):
+    return v if isinstance(v, (int, float)) and not isinstance(v, bool) else math.nan
+
+
+class InfoCollector:
+    """Sampler `collect` for one INFO ALL round trip per tick
+
+    Besides the COUNTERS/GAUGES columns it derives the interval hit ratio and
+    keeps per command call/usec deltas of the last `elapsed` seconds in `commands`.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        self.info = {}
+        self.commands = []
+        self.elapsed = math.nan   # seconds covered by `commands`
+        self._previous = None
+        self._previous_at = None
+
+    def __call__(self):
+        info = self.r.info('all')
+        now = time.monotonic()
+        values = {column: _number(info.get(field)) for column, field in {**COUNTERS, **GAUGES}.items()}
+        values['keys'] = sum(v.get('keys', 0) for k, v in info.items() if k.startswith('db') and isinstance(v, dict))
+        previous = self._previous or {}
+        hits = info.get('keyspace_hits', 0) - previous.get('keyspace_hits', 0)
+        misses = info.get('keyspace_misses', 0) - previous.get('keyspace_misses', 0)
+        values['hit_ratio'] = hits / (hits + misses) if self._previous and hits + misses else math.nan
+        self.commands = self._command_deltas(info, previous)
+        self.elapsed = now - self._previous_at if self._previous_at else math.nan
+        self.info = info
+        self._previous, self._previous_at = info, now
+        return values
+
+    def _command_deltas(self, info, previous):
+        if not previous:
+            return []
+        commands = []
+        for key, stats in info.items():
+            if not key.startswith('cmdstat_'):
+                continue
+            before = previous.get(key, {})
+            calls = stats['calls'] - before.get('calls', 0)
+            usec = stats['usec'] - before.get('usec', 0)
+            if calls > 0:
+                commands.append({
+                    'cmd': key[len('cmdstat_'):],
+                    'calls': calls,
+                    'usec': usec,
+                    'usec_per_call': usec / calls,
+                    'failed': stats.get('failed_calls', 0) - before.get('failed_calls', 0),
+                })
+        return sorted(commands, key=lambda c: c['usec'], reverse=True)
+
+
+def _fmt(column, v):
+    if isinstance(v, float) and math.isnan(v):
+        return '-'
+    if column in _BYTES or column.split('/')[0] in _BYTES:
+        return human_bytes(v) + ('/s' if '/' in column else '')
+    if column == 'hit_ratio':
+        return f'{v * 100:.1f}%'
+    if isinstance(v, float) and not v.is_integer():
+        return f'{v:,.2f}'
+    return f'{int(v):,}'
+
+
+class ScreenSink(Sink):
+    """Redraws a top like screen: metrics with sparklines, then the busiest commands"""
+
+    def __init__(self, sampler, collector, title, width=40, top=10):
+        self.sampler = sampler
+        self.collector = collector
+        self.title = title
+        self.width = width
+        self.top = top
+        self._tty = sys.stdout.isatty()
+
+    def write(self, ts, row):
+        buffer = self.sampler.buffer
+        info = self.collector.info
+        interval = self.sampler.interval
+        lines = [
+            f"{self.title}  redis {info.get('redis_version', '?')} ({info.get('role', '?')}), "
+            f"up {pretty_duration(info.get('uptime_in_seconds', 0))}  "
+            f"{datetime.fromtimestamp(ts):%H:%M:%S}  every {interval}s, {len(buffer)} samples",
+            '',
+        ]
+        metrics = []
+        for column in COUNTERS:
+            metrics.append([f'{column}/s', _fmt(f'{column}/s', row[f'{column}/s']),
+                            sparkline(buffer.rates(column, self.width), self.width), _fmt(column, row[column])])
+        for column in list(GAUGES) + ['keys', 'hit_ratio']:
+            metrics.append([column, _fmt(column, row[column]), sparkline(buffer.column(column, self.width), self.width), ''])
+        lines.append(tabulate(metrics, headers=['Metric', 'Now', f'Last {self.width}', 'Total'], disable_numparse=True))
+        commands = self.collector.commands[:self.top]
+        if commands:
+            total_usec = sum(c['usec'] for c in self.collector.commands) or 1
+            lines += ['', tabulate([
+                [c['cmd'], f"{c['calls'] / self.collector.elapsed:,.1f}", f"{c['usec_per_call']:,.1f}", f"{c['usec'] / total_usec * 100:.1f}", c['failed']]
+                for c in commands
+            ], headers=['Command', 'Calls/s', 'usec/call', 'Time%', 'Failed'], disable_numparse=True)]
+        screen = '\n'.join(lines)
+        # redraw in place on a terminal, plain frames otherwise (e.g. piped to a file)
+        echo('\x1b[H\x1b[J' + screen if self._tty else screen + '\n')
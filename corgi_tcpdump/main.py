@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 import click
 from icecream import ic
-from corgi_common.scriptutils import run_script
+from corgi_common.scriptutils import run_script, run_scripts
 from corgi_common import config_logging, pretty_print
-from corgi_common.textutils import extract_mp
+from corgi_common.textutils import Scanner
+from corgi_common.columnarutils import ColumnarWriter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -106,7 +107,8 @@ def cli():
 @click.option('--dry', is_flag=True)
 @click.option('-x', is_flag=True)
 @click.option('--raw', is_flag=True)
-def conversations(pcap, dry, _type, x, raw):
+@click.option('--columnar', 'columnar_path', help='Also save conversations to this columnar dataset (directory)')
+def conversations(pcap, dry, _type, x, raw, columnar_path):
     cmd = f'tshark -n -q -r {pcap} -z conv,{_type}'
     if dry:
         print(cmd)
@@ -117,6 +119,10 @@ def conversations(pcap, dry, _type, x, raw):
         print(stdout)
         return
     convs = _parse_convs(stdout)
+    if columnar_path:
+        with ColumnarWriter(columnar_path) as writer:
+            for conv in convs:
+                writer.write(conv)
     pretty_print(convs, mappings={
         'Src': 'src',
         'Dst': 'dst',
@@ -200,20 +206,29 @@ def follow(pcap, http, color, dry, stream, raw):
             click.echo(data)
     pass
 
+
+_CAPINFOS_SCANNER = Scanner({
+    'duration': r'Capture duration:\s*(.*) seconds',
+    'data_byte_rate': r'Data byte rate:\s*(.*) (kBps|bytes/s)',
+    'packet_rate': r'Average packet rate:\s*(.*) packets/s',
+    'packet_size': r'Average packet size:\s*(.*) (bytes)',
+})
+
 def _analyze_summary(pcap, dry=False):
     cmd = f"capinfos {pcap}"
-    rc, stdout, stderr = run_script(cmd, capture=True)
-    capture_duration_secs = _int(extract_mp(r'Capture duration:\s*(.*) seconds', stdout)[0])
+    rc, stdout, stderr = run_script(cmd, capture=True, fast_spawn=True)
+    capinfos = _CAPINFOS_SCANNER.scan(stdout)
+    capture_duration_secs = _int(capinfos['duration'])
 
-    av_data_byte_rate, av_data_byte_rate_scale = extract_mp(r'Data byte rate:\s*(.*) (kBps|bytes/s)', stdout)[0]
+    av_data_byte_rate, av_data_byte_rate_scale = capinfos['data_byte_rate']
     av_data_byte_rate = _float(av_data_byte_rate)
     assert av_data_byte_rate_scale in ['kBps', 'bytes/s']
     if av_data_byte_rate_scale == 'kBps':
         av_data_byte_rate *= 1024
 
-    av_pkt_rate = _float(extract_mp(r'Average packet rate:\s*(.*) packets/s', stdout)[0])
+    av_pkt_rate = _float(capinfos['packet_rate'])
 
-    av_pkt_size, av_pkt_size_scale = extract_mp(r'Average packet size:\s*(.*) (bytes)', stdout)[0]
+    av_pkt_size, av_pkt_size_scale = capinfos['packet_size']
     assert av_pkt_size_scale in ['bytes']
     av_pkt_size = _float(av_pkt_size)
 
@@ -253,11 +268,10 @@ def _analyze_tcp(pcap, stream=None, dry=False):
         click.echo(out_of_order_cmd)
         return
 
-    rc0, stdout0, stderr0 = run_script(retransmission_cmd, capture=True)
+    (rc0, stdout0, stderr0, _), (rc1, stdout1, stderr1, _) = run_scripts([retransmission_cmd, out_of_order_cmd])
     frames0, bytes0  = _frames_bytes(stdout0)
     ic(rc0, frames0, bytes0)
 
-    rc1, stdout1, stderr1 = run_script(out_of_order_cmd, capture=True)
     frames1, bytes1  = _frames_bytes(stdout1)
     ic(rc1, frames1, bytes1)
 
@@ -5,6 +5,7 @@ import os
 import functools
 import pickle
 import tempfile
+from corgi_common.restutils import new_session
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -24,8 +25,7 @@ def no_empty_args(f):
 
 def authenticate(host, username, password) -> requests.Session:
     url = "https://{}/rest/com/vmware/cis/session".format(host)
-    session = requests.Session()
-    session.verify = False
+    session = new_session(verify=False)
     logger.info("Creating VC session ...")
     r = session.post(url, auth=(username, password))
     if not r.ok:
@@ -33,11 +33,11 @@ def authenticate(host, username, password) -> requests.Session:
         r.raise_for_status()
     token = r.json()['value']
     logger.info(f"Token for VC session: {token}")
-    session.headers = {
+    session.headers.update({
         'Content-Type': 'application/json',
         'Accept': 'application/json',
         'vmware-api-session-id': token,
-    }
+    })
     logger.info(f"Got session: {session}")
     return session
 
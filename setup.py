@@ -15,7 +15,7 @@ config = {
     'author' : 'Hao Ruan',
     'author_email' : 'ruanhao1116@gmail.com',
     'version' : '1.0',
-    'packages' : find_packages(),
+    'packages' : find_packages(exclude=['benchmarks', 'benchmarks.*']),
     'install_requires': install_requires,
     # 'include_package_data': True, # use this option together with a MANIFEST.in
     'package_data': {
@@ -24,9 +24,9 @@ config = {
         'corgi_misc': ['*'],
         'corgi_pg': ['*'],
         'corgi_forfun': ['*'],
-        'corgi_aws': ['*', 'templates/*'],
-        'corgi_build': ['*', 'templates/*'],
-        'corgi_configure': ['*', 'sh/*', 'templates/*'],
+        'corgi_aws': ['*', 'templates/*', 'templates/__compiled__/*'],
+        'corgi_build': ['*', 'templates/*', 'templates/__compiled__/*'],
+        'corgi_configure': ['*', 'sh/*', 'templates/*', 'templates/__compiled__/*'],
     },
     'setup_requires': ['wheel'],
     'entry_points': {